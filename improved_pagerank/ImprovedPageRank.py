@@ -1,13 +1,24 @@
 from improved_pagerank.loader.loader import Loader
 from improved_pagerank.graph_weight_computation.PPI_graph_weight_computation import ComputePPIGraphWeight
+from improved_pagerank.graph_weight_computation.shared_annotation_index import SharedAnnotationIndex
 from improved_pagerank.matrix_creation.convex_combination_aggregation_matrix_creation import ConvexCombinationMatrixAggregationCreation
+from improved_pagerank.matrix_creation.multi_network_aggregation_creation import MultiNetworkAggregationCreation
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+from improved_pagerank.matrix_creation.convex_combination_operator import ConvexCombinationOperator
 from improved_pagerank.personalization_vector_creation.default_personalization_vector_creation import DefaultPersonalizationVectorCreation
 from improved_pagerank.personalization_vector_creation.biological_personalization_vector_creation import BiologicalPersonalizationVectorCreation
 from improved_pagerank.personalization_vector_creation.topological_personalization_vector_creation import TopologicalPersonalizationVectorCreation
+from improved_pagerank.personalization_vector_creation.personalization_vector_cache import PersonalizationVectorCache
 from improved_pagerank.personalization_vector_aggregation.p_v_aggregation import PersonalizationVectorAggregation
 from improved_pagerank.core.page_rank_core import PageRankCore
+from improved_pagerank.core.sparse_page_rank_core import SparsePageRankCore
+from improved_pagerank.core.batched_page_rank_core import BatchedPageRankCore
+from improved_pagerank.core.local_push_page_rank_core import LocalPushPageRankCore
 from improved_pagerank.core.page_rank_ori import PageRankOri
+from improved_pagerank.core.sparse_page_rank_ori import SparsePageRankOri
+from improved_pagerank.core.core import RandomWalkWithRestartCore
 
+import os
 import time
 import csv
 
@@ -28,6 +39,19 @@ class ImprovedPageRankCancerGeneRanking():
         network_weight_flag = True,
         output_file_path = None,
         algorithm = None,
+        damping_factor = 0.85,
+        max_iterations = None,
+        solver = "power",
+        top_k = None,
+        top_k_stable_iterations = None,
+        push_tolerance = None,
+        compact = False,
+        sparse_pipeline = False,
+        cache_dir = None,
+        shared_annotation_index_path = None,
+        additional_network_file_paths = None,
+        network_weights = None,
+        personalization_vector_cache = None,
         ):
 
         t0 = time.perf_counter()
@@ -35,33 +59,74 @@ class ImprovedPageRankCancerGeneRanking():
         self.alpha = alpha
         self.beta = beta
         self.algorithm = algorithm
+        self.damping_factor = damping_factor
+        self.max_iterations = max_iterations
+        self.solver = solver
+        self.top_k = top_k
+        self.top_k_stable_iterations = top_k_stable_iterations
+        self.push_tolerance = push_tolerance
+
+        # component personalization vectors of earlier runs; a cache_dir alone
+        # keeps them on disk
+        if personalization_vector_cache == None and cache_dir != None:
+            personalization_vector_cache = PersonalizationVectorCache(cache_dir = os.path.join(cache_dir, "personalization_vectors"))
+        self.personalization_vector_cache = personalization_vector_cache
+
+        if self.algorithm == "biorank_push":
+            assert self.push_tolerance != None, "biorank_push needs push_tolerance"
+        self.compact = compact
+
+        if self.compact:
+            assert self.algorithm in ["biorank_sparse", "biorank_push", "rwr", "ori_sparse"], "compact mode needs one of the sparse engines"
+
+        # networks are parsed straight into CSR; stages without a sparse form
+        # get networkx graphs from them. Compact mode interns the gene names
+        # from the loader on, so it runs on this pipeline
+        self.sparse_pipeline = sparse_pipeline or self.compact
+
+        if shared_annotation_index_path != None:
+            assert self.sparse_pipeline and network_weight_flag, "the shared annotation index weights the sparse pipeline's PPI"
         
-        print("Loading Networks....")
-        self.file_loader_step = Loader(ppi_file_path,
-            co_expression_file_path,
-            seed_file_path,
+        # a list of seed files is ranked as one batch over the shared network
+        if isinstance(seed_file_path, (list, tuple)):
+            seed_file_paths = list(seed_file_path)
+        else:
+            seed_file_paths = [seed_file_path]
+
+        if len(seed_file_paths) > 1:
+            # the batch is iterated with the power method, without top-k
+            # stopping, and every seed set gets its own ranked list
+            assert self.algorithm in ["biorank", "biorank_sparse"], "Only the biorank algorithm ranks a batch of seed sets"
+            assert self.solver == "power", "a batch of seed sets is ranked with the power solver only"
+            assert self.top_k == None and self.top_k_stable_iterations == None, "top-k stopping does not apply to a batch of seed sets"
+            assert output_file_path == None or isinstance(output_file_path, (list, tuple)), "One output file is needed per seed file"
+
+        PPI, CO_expression, seed_sets, secondary_seed_set, map__gene__ontologies, disease_ontology = self.load_inputs(
+            seed_file_paths = seed_file_paths,
+            ppi_file_path = ppi_file_path,
+            co_expression_file_path = co_expression_file_path,
             secondary_seed_file_path = secondary_seed_file_path,
             disease_ontology_file_path = disease_ontology_file_path,
-            map_gene_ontologies_file_path = map__gene__ontologies_file_path)
-        
-        PPI, CO_expression, seed_set, secondary_seed_set, map__gene__ontologies, disease_ontology = self.file_loader_step.run()
-        print("Loading Time:", time.perf_counter() - t0)
-        print()
-
-        if network_weight_flag:
-            t0 = time.perf_counter()
-
-            print("Weighting Networks....")
-            self.compute_ppi_weight = ComputePPIGraphWeight(PPI,map__gene__ontologies = map__gene__ontologies, disease_ontology = disease_ontology)
-            PPI = self.compute_ppi_weight.compute_weight_on_graph()
-            print("Weighting Networks Computation Time:", time.perf_counter() - t0)
-            print()
+            map__gene__ontologies_file_path = map__gene__ontologies_file_path,
+            network_weight_flag = network_weight_flag,
+            sparse_networks = self.sparse_pipeline,
+            compact = self.compact,
+            cache_dir = cache_dir,
+            shared_annotation_index_path = shared_annotation_index_path)
+
+        # further networks (pathway co-membership, signaling, ...) for the
+        # multi_network aggregation
+        additional_networks = []
+        if additional_network_file_paths != None:
+            load_network = self.file_loader_step.load_sparse_graph if self.sparse_pipeline else self.file_loader_step.load_graph
+            additional_networks = [load_network(file_path) for file_path in additional_network_file_paths]
+        self.network_weights = network_weights
 
         
         t0 = time.perf_counter()
         print("Computing aggragation with policy:", matrix_aggregation_policy,"....")
-        G, V = self.compute_matrix_aggregation(PPI, CO_expression, matrix_aggregation_policy)
-        print(f"Graph has {len(G.nodes())} nodes and {len(G.edges())} edges")
+        G, V = self.compute_matrix_aggregation(PPI, CO_expression, matrix_aggregation_policy, additional_networks = additional_networks)
+        print(f"Graph has {G.number_of_nodes()} nodes and {G.number_of_edges()} edges")
         
         print("Time for computing Aggregation Matrix:", time.perf_counter() - t0)
         print()
@@ -70,32 +135,48 @@ class ImprovedPageRankCancerGeneRanking():
         #self.__print_aggregated_network_stats__(G)
             
         print()
-        t0 = time.perf_counter()
 
-        print("Computing personalization vectors with policies:", ", ".join(personalization_vector_creation_policies),"....")
-        personalization_vectors = self.compute_personalization_vectors(
-                
-            seed_set = seed_set, 
-            V = V,
-                
-            disease_ontology = disease_ontology, 
-            map__gene_name__ontologies = map__gene__ontologies, 
-            universe_ontologies = None,
+        # the sparse engines take the personalization vectors as sparse
+        # vectors over the network nodes
+        sparse_personalization_vector = isinstance(G, (SparseNetwork, ConvexCombinationOperator)) and self.algorithm in ["biorank_sparse", "biorank_push", "rwr"]
 
+        personalization_vectors_per_seed_set = self.compute_personalization_vectors_per_seed_set(
+            seed_sets = seed_sets,
+            V = V,
             G = G,
             secondary_seed_set = secondary_seed_set,
-            chosen_policies = personalization_vector_creation_policies )
-
-        print("Time for computing personalization Vectors:", time.perf_counter() - t0)
-        print()
+            disease_ontology = disease_ontology,
+            map__gene__ontologies = map__gene__ontologies,
+            chosen_policies = personalization_vector_creation_policies,
+            nodes = G.nodes if sparse_personalization_vector else None)
 
         t0 = time.perf_counter()
 
 
         print("Aggregating personalization vectors with policy:", personalization_vector_aggregation_policy ,"....")
-        self.personalization_vector_aggregation_step = PersonalizationVectorAggregation(personalization_vectors, universe = V, alpha = self.alpha)
-        p_0 = self.personalization_vector_aggregation_step.run(chosen_policy = personalization_vector_aggregation_policy)
+        p_0_per_seed_set = []
+
+        for personalization_vectors in personalization_vectors_per_seed_set:
+            if sparse_personalization_vector:
+                self.personalization_vector_aggregation_step = PersonalizationVectorAggregation(personalization_vectors, universe = V, alpha = self.alpha, nodes = G.nodes)
+                p_0_per_seed_set.append(self.personalization_vector_aggregation_step.run_sparse(chosen_policy = personalization_vector_aggregation_policy))
+            else:
+                self.personalization_vector_aggregation_step = PersonalizationVectorAggregation(personalization_vectors, universe = V, alpha = self.alpha)
+                p_0_per_seed_set.append(self.personalization_vector_aggregation_step.run(chosen_policy = personalization_vector_aggregation_policy))
+
+        p_0 = p_0_per_seed_set[0]
   
+        if self.compact:
+            # from here on only the float32 CSR network and the sparse p_0 are
+            # kept; names are only looked up again for the ranked list
+            if not isinstance(G, (SparseNetwork, ConvexCombinationOperator)):
+                G = SparseNetwork.from_graph(G, default_weight = 1.0 if self.algorithm == "rwr" else 0.0)
+            G = G.compact()
+            del V, PPI, CO_expression, personalization_vectors, personalization_vectors_per_seed_set
+            self.personalization_vector_aggregation_step = None
+            if network_weight_flag:
+                self.compute_ppi_weight.PPI = None
+
         # p_1 = self.compute_normalized_degree(G)
         # p = self.aggregate_p0_and_p1(p_0,p_1)
 
@@ -103,21 +184,205 @@ class ImprovedPageRankCancerGeneRanking():
 
         print("Exectuting Pagerank....")
 
-        if self.algorithm == "biorank":
-            core = PageRankCore(p_0, G)
+        if isinstance(G, ConvexCombinationOperator) and (self.algorithm != "biorank_sparse" or self.solver == "gauss_seidel"):
+            # only the biorank_sparse solvers apply the lazy aggregation
+            G = G.to_network()
+
+        if isinstance(G, SparseNetwork) and self.algorithm not in ["biorank_sparse", "biorank_push", "rwr", "ori_sparse"]:
+            # the networkx engines
+            G = G.to_graph()
+
+        if len(seed_file_paths) > 1:
+            core = BatchedPageRankCore(p_0_per_seed_set, G, damping_factor = self.damping_factor, max_iterations = self.max_iterations)
+        elif self.algorithm == "biorank":
+            core = PageRankCore(p_0, G, damping_factor = self.damping_factor)
+        elif self.algorithm == "biorank_sparse":
+            core = SparsePageRankCore(p_0, G, damping_factor = self.damping_factor, solver = self.solver, max_iterations = self.max_iterations,
+                top_k = self.top_k, top_k_stable_iterations = self.top_k_stable_iterations)
+        elif self.algorithm == "biorank_push":
+            core = LocalPushPageRankCore(p_0, G, damping_factor = self.damping_factor, tolerance = self.push_tolerance)
+        elif self.algorithm == "rwr":
+            core = RandomWalkWithRestartCore(p_0, G, restart_prob = 1 - self.damping_factor, max_iterations = self.max_iterations)
+        elif self.algorithm == "ori_sparse":
+            core = SparsePageRankOri(G, restart_prob = self.damping_factor)
         else:
-            core = PageRankOri(G)
+            core = PageRankOri(G, restart_prob = self.damping_factor)
+
+        if len(seed_file_paths) > 1:
+            self.ranked_lists = core.run()
+        else:
+            self.ranked_lists = [list(core.run())]
+
+        self.ranked_list = self.ranked_lists[0]
+
+        if isinstance(core, SparsePageRankCore) and not isinstance(core, BatchedPageRankCore):
+            print(f"Solver: {core.solver}, iterations: {core.iterations}, residual: {core.residual:.3e}")
+            if not core.converged:
+                print(f"Warning: {core.solver} stopped at max_iterations = {core.max_iterations} before converging")
+            if core.top_k_stopping != None:
+                print(f"Stopped once the top {core.top_k} was {core.top_k_stopping}")
+
+        if isinstance(core, BatchedPageRankCore) and not core.converged.all():
+            print(f"Warning: {(~core.converged).sum()} of {len(core.converged)} seed sets stopped at max_iterations = {core.max_iterations} before converging")
+
+        if isinstance(core, LocalPushPageRankCore):
+            self.approximation_error_bound = core.error_bound
+            print(f"Pushes: {core.pushes}, L1 approximation error bound: {core.error_bound:.3e}")
 
-        self.ranked_list = core.run()
         print("Time for Exectuting Page_rank", time.perf_counter() - t0)
                 
         if output_file_path != None:
-            self.save_ranked_list(output_file_path)
+            if isinstance(output_file_path, (list, tuple)):
+                assert len(output_file_path) == len(self.ranked_lists), "One output file is needed per seed file"
+                for file_path, ranked_list in zip(output_file_path, self.ranked_lists):
+                    self.save_ranked_list(file_path, ranked_list = ranked_list)
+            else:
+                self.save_ranked_list(output_file_path)
 
         end_time = time.perf_counter()
         self.total_runtime_seconds=end_time-start_time
         print(f"Done! Total execution time: {self.total_runtime_seconds:.2f} seconds.")
 
+    def load_inputs(self,
+        seed_file_paths,
+        ppi_file_path = None,
+        co_expression_file_path = None,
+        secondary_seed_file_path = None,
+        disease_ontology_file_path = None,
+        map__gene__ontologies_file_path = None,
+        network_weight_flag = True,
+        sparse_networks = False,
+        compact = False,
+        cache_dir = None,
+        shared_annotation_index_path = None):
+        """ Load every input file and weight the PPI network. Returns the PPI,
+        the co-expression network, one seed set per seed file, the secondary
+        seed set, the gene -> ontologies map and the disease ontology.
+        With sparse_networks the networks are parsed by load_sparse_graph and
+        the map is an OntologyIncidence, with compact as float32 / int32 CSR;
+        with cache_dir the parsed files are cached there, and the PPI is then
+        weighted through the SharedAnnotationIndex kept at
+        shared_annotation_index_path when one is given.
+        """
+        t0 = time.perf_counter()
+
+        print("Loading Networks....")
+        self.file_loader_step = Loader(ppi_file_path,
+            co_expression_file_path,
+            seed_file_paths[0],
+            secondary_seed_file_path = secondary_seed_file_path,
+            disease_ontology_file_path = disease_ontology_file_path,
+            map_gene_ontologies_file_path = map__gene__ontologies_file_path,
+            sparse_networks = sparse_networks,
+            compact = compact,
+            cache_dir = cache_dir)
+        
+        PPI, CO_expression, seed_set, secondary_seed_set, map__gene__ontologies, disease_ontology = self.file_loader_step.run()
+        seed_sets = [seed_set] + [self.file_loader_step.load_seed_set(path) for path in seed_file_paths[1:]]
+
+        if sparse_networks:
+            self.ontology_incidence = map__gene__ontologies
+        print("Loading Time:", time.perf_counter() - t0)
+        for name, seconds in self.file_loader_step.load_times.items():
+            print(f"    {name}: {seconds:.3f}")
+        print()
+
+        if network_weight_flag:
+            t0 = time.perf_counter()
+
+            print("Weighting Networks....")
+            if sparse_networks:
+                shared_annotation_index = None
+                if shared_annotation_index_path != None:
+                    shared_annotation_index = SharedAnnotationIndex.load_or_build(shared_annotation_index_path, PPI, self.ontology_incidence)
+
+                self.compute_ppi_weight = ComputePPIGraphWeight(PPI, disease_ontology = disease_ontology, ontology_incidence = self.ontology_incidence,
+                    shared_annotation_index = shared_annotation_index)
+                PPI = self.compute_ppi_weight.compute_weight_on_sparse_network()
+            else:
+                self.compute_ppi_weight = ComputePPIGraphWeight(PPI,map__gene__ontologies = map__gene__ontologies, disease_ontology = disease_ontology)
+                PPI = self.compute_ppi_weight.compute_weight_on_graph()
+            print("Weighting Networks Computation Time:", time.perf_counter() - t0)
+            print()
+
+        return PPI, CO_expression, seed_sets, secondary_seed_set, map__gene__ontologies, disease_ontology
+
+    def compute_personalization_vectors_per_seed_set(self,
+        seed_sets,
+        V,
+        G = None,
+        secondary_seed_set = None,
+        disease_ontology = None,
+        map__gene__ontologies = None,
+        chosen_policies = ["biological"],
+        nodes = None):
+        """ compute_personalization_vectors for each seed set, with timing.
+        With a personalization_vector_cache, seed sets whose vectors are all
+        cached skip it. With nodes, the vectors are SparsePersonalizationVectors
+        over them.
+        """
+        t0 = time.perf_counter()
+
+        if isinstance(G, ConvexCombinationOperator) and "topological" in chosen_policies:
+            G = G.to_network()
+
+        if G != None and not isinstance(G, SparseNetwork) and "topological" in chosen_policies:
+            # the topological scores come from sparse products on the CSR form
+            G = SparseNetwork.from_graph(G)
+
+        print("Computing personalization vectors with policies:", ", ".join(chosen_policies),"....")
+        personalization_vectors_per_seed_set = []
+
+        node_index = {node: index for index, node in enumerate(nodes)} if nodes != None else None
+
+        # the order compute_personalization_vectors returns the vectors in
+        policies = [policy for policy in ["default", "biological", "topological"] if policy in chosen_policies]
+
+        cache = self.personalization_vector_cache
+        if cache != None:
+            input_digests = cache.input_digests(V,
+                nodes = nodes,
+                G = G if "topological" in policies else None,
+                secondary_seed_set = secondary_seed_set if "topological" in policies else None,
+                disease_ontology = disease_ontology if "biological" in policies else None,
+                map__gene__ontologies = map__gene__ontologies if "biological" in policies else None)
+
+        for seed_set in seed_sets:
+            if cache != None:
+                keys = [cache.key(policy, seed_set, input_digests) for policy in policies]
+                personalization_vectors = [cache.get(key) for key in keys]
+
+                if all(personalization_vector != None for personalization_vector in personalization_vectors):
+                    print("Personalization vectors read from the cache")
+                    personalization_vectors_per_seed_set.append(personalization_vectors)
+                    continue
+
+            personalization_vectors = self.compute_personalization_vectors(
+                
+                seed_set = seed_set, 
+                V = V,
+                
+                disease_ontology = disease_ontology, 
+                map__gene_name__ontologies = map__gene__ontologies, 
+                universe_ontologies = None,
+
+                G = G,
+                secondary_seed_set = secondary_seed_set,
+                chosen_policies = chosen_policies,
+                nodes = nodes,
+                node_index = node_index)
+
+            if cache != None:
+                for key, personalization_vector in zip(keys, personalization_vectors):
+                    cache.put(key, personalization_vector)
+
+            personalization_vectors_per_seed_set.append(personalization_vectors)
+
+        print("Time for computing personalization Vectors:", time.perf_counter() - t0)
+        print()
+
+        return personalization_vectors_per_seed_set
+
     def compute_personalization_vectors(self,
         seed_set,
         V,
@@ -129,7 +394,12 @@ class ImprovedPageRankCancerGeneRanking():
         G = None,
         secondary_seed_set = None,
 
-        chosen_policies = ["biological"]):
+        chosen_policies = ["biological"],
+        nodes = None,
+        node_index = None):
+        """ The personalization vectors of the chosen policies, as dicts over V
+        or, with nodes, as SparsePersonalizationVectors over nodes.
+        """
 
         default_p_v = None
         overwritten_p_v = None
@@ -140,11 +410,11 @@ class ImprovedPageRankCancerGeneRanking():
 
         if "default" in chosen_policies:
             personalization_vector_creation_step = DefaultPersonalizationVectorCreation(seed_set, V)
-            default_p_v = personalization_vector_creation_step.run()
+            default_p_v = personalization_vector_creation_step.run() if nodes == None else personalization_vector_creation_step.run_sparse(nodes, node_index = node_index)
 
         if "topological" in chosen_policies:
             personalization_vector_creation_step = TopologicalPersonalizationVectorCreation(seed_set, V,G = G, secondary_seed_set = secondary_seed_set)
-            topological_p_v = personalization_vector_creation_step.run()
+            topological_p_v = personalization_vector_creation_step.run() if nodes == None else personalization_vector_creation_step.run_sparse(nodes, node_index = node_index)
 
         if "biological" in chosen_policies:
 
@@ -154,7 +424,7 @@ class ImprovedPageRankCancerGeneRanking():
                 disease_ontology = disease_ontology, 
                 map__gene_name__ontologies = map__gene_name__ontologies)
 
-            biological_p_v = personalization_vector_creation_step.run()
+            biological_p_v = personalization_vector_creation_step.run() if nodes == None else personalization_vector_creation_step.run_sparse(nodes, node_index = node_index)
 
 
         if default_p_v != None:
@@ -170,30 +440,63 @@ class ImprovedPageRankCancerGeneRanking():
         
         return personalization_vectors
 
-    def compute_matrix_aggregation(self, PPI_network, CO_expression_network, matrix_aggregation_policy = "convex_combination"):
+    def compute_matrix_aggregation(self, PPI_network, CO_expression_network, matrix_aggregation_policy = "convex_combination", additional_networks = []):
+
 
+        # SparseNetworks (sparse_pipeline) are aggregated as CSR matrices
+        sparse_networks = isinstance(PPI_network, SparseNetwork) or isinstance(CO_expression_network, SparseNetwork)
 
         if matrix_aggregation_policy == "convex_combination":
             
             matrix_creation_step = ConvexCombinationMatrixAggregationCreation(PPI_network, CO_expression_network,self.beta) 
-            G, V = matrix_creation_step.run(chosen_policy = "PPI_network")
+            if sparse_networks:
+                G, V = matrix_creation_step.run_sparse(chosen_policy = "PPI_network")
+            else:
+                G, V = matrix_creation_step.run(chosen_policy = "PPI_network")
 
             return G,V
 
+        elif matrix_aggregation_policy == "lazy_convex_combination":
+
+            # beta * P + (1 - beta) * C applied on the fly by the sparse engines
+            assert sparse_networks, "lazy_convex_combination aggregates the networks of the sparse pipeline"
+            matrix_creation_step = ConvexCombinationMatrixAggregationCreation(PPI_network, CO_expression_network, self.beta)
+            G, V = matrix_creation_step.run_lazy(chosen_policy = "PPI_network")
+
+            return G, V
+
+        elif matrix_aggregation_policy == "multi_network":
+
+            # PPI, co-expression and the additional networks, weighted by
+            # network_weights in that order (equally when not given), on the
+            # PPI node set
+            networks = [network for network in [PPI_network, CO_expression_network] if network != None] + list(additional_networks)
+            network_weights = self.network_weights
+            if network_weights == None:
+                network_weights = [1.0 / len(networks)] * len(networks)
+
+            matrix_creation_step = MultiNetworkAggregationCreation(networks, network_weights)
+            G, V = matrix_creation_step.run(chosen_policy = "first_network")
+
+            return G, V
+
         elif matrix_aggregation_policy == "only_ppi_network":
             
-            V = set(PPI_network.nodes())
+            V = set(PPI_network.nodes) if sparse_networks else set(PPI_network.nodes())
             return PPI_network, V
 
         elif matrix_aggregation_policy == "only_co_expression_network":
 
-            V = set(CO_expression_network.nodes())
+            V = set(CO_expression_network.nodes) if sparse_networks else set(CO_expression_network.nodes())
             return CO_expression_network, V
 
 
-    def save_ranked_list(self, file_path):
+    def save_ranked_list(self, file_path, ranked_list = None):
+
+        if ranked_list is None:
+            ranked_list = self.ranked_list
 
-        ranked_list = [[item[0], item[1]] for item in self.ranked_list]
+        ranked_list = [[item[0], item[1]] for item in ranked_list]
 
         csv_writer = csv.writer(open(file_path,'w'), delimiter = "\t")
         csv_writer.writerow(["GeneNames","Score"])
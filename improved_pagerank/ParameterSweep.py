@@ -0,0 +1,186 @@
+from improved_pagerank.ImprovedPageRank import ImprovedPageRankCancerGeneRanking
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+from improved_pagerank.personalization_vector_creation.personalization_vector_cache import PersonalizationVectorCache
+from improved_pagerank.personalization_vector_aggregation.p_v_aggregation import PersonalizationVectorAggregation
+from improved_pagerank.core.sparse_page_rank_core import SparsePageRankCore
+from improved_pagerank.evaluation.metrics import recall_at_k, ndcg_at_k
+
+import os
+import itertools
+import time
+import csv
+
+class ParameterSweepCancerGeneRanking(ImprovedPageRankCancerGeneRanking):
+    """ Grid search over alpha, beta and the damping factor.
+
+    Files are loaded as SparseNetworks (cached with cache_dir), the PPI is
+    weighted and the component personalization vectors are computed once. The
+    row-normalized PPI (P) and co-expression (C) matrices are the components
+    of the lazy aggregation, on the node index of the aggregated network, so
+    every beta is just beta * P + (1 - beta) * C, and every alpha is a mix of the
+    same component vectors. Each solve is warm-started from the solution of
+    the closest grid point already evaluated.
+
+    Node set and personalization vectors come from the aggregation at
+    beta = 0.5 ("PPI_network" policy), which matches the pipeline for any
+    beta strictly between 0 and 1.
+    """
+
+    def __init__(self,
+        seed_file_path,
+        ppi_file_path,
+        co_expression_file_path,
+        disease_ontology_file_path = None,
+        map__gene__ontologies_file_path = None,
+        secondary_seed_file_path = None,
+        personalization_vector_creation_policies = ["biological","topological"],
+        personalization_vector_aggregation_policy = "Sum",
+        alphas = [0.5],
+        betas = [0.5],
+        damping_factors = [0.85],
+        network_weight_flag = True,
+        solver = "power",
+        reference_gene_file_path = None,
+        top_k = 100,
+        output_file_path = None,
+        cache_dir = None,
+        personalization_vector_cache = None,
+        ):
+
+        assert all(0 < beta < 1 for beta in betas), "betas must be strictly between 0 and 1"
+
+        start_time = time.perf_counter()
+        self.beta = 0.5
+        self.solver = solver
+        self.top_k = top_k
+
+        if personalization_vector_cache == None and cache_dir != None:
+            personalization_vector_cache = PersonalizationVectorCache(cache_dir = os.path.join(cache_dir, "personalization_vectors"))
+        self.personalization_vector_cache = personalization_vector_cache
+
+        PPI, CO_expression, seed_sets, secondary_seed_set, map__gene__ontologies, disease_ontology = self.load_inputs(
+            seed_file_paths = [seed_file_path],
+            ppi_file_path = ppi_file_path,
+            co_expression_file_path = co_expression_file_path,
+            secondary_seed_file_path = secondary_seed_file_path,
+            disease_ontology_file_path = disease_ontology_file_path,
+            map__gene__ontologies_file_path = map__gene__ontologies_file_path,
+            network_weight_flag = network_weight_flag,
+            sparse_networks = True,
+            cache_dir = cache_dir)
+
+        if reference_gene_file_path != None:
+            self.reference_genes = self.file_loader_step.load_seed_set(reference_gene_file_path)
+        else:
+            self.reference_genes = None
+
+        t0 = time.perf_counter()
+        print("Computing component matrices....")
+        G, V = self.compute_matrix_aggregation(PPI, CO_expression, "lazy_convex_combination")
+        self.P, self.C = G.components
+        self.nodes = G.nodes
+        print("Time for computing component matrices:", time.perf_counter() - t0)
+        print()
+
+        personalization_vectors = self.compute_personalization_vectors_per_seed_set(
+            seed_sets = seed_sets,
+            V = V,
+            G = G,
+            secondary_seed_set = secondary_seed_set,
+            disease_ontology = disease_ontology,
+            map__gene__ontologies = map__gene__ontologies,
+            chosen_policies = personalization_vector_creation_policies)[0]
+
+        self.p_0_per_alpha = {}
+        for alpha in alphas:
+            personalization_vector_aggregation_step = PersonalizationVectorAggregation(personalization_vectors, universe = V, alpha = alpha, nodes = self.nodes)
+            self.p_0_per_alpha[alpha] = personalization_vector_aggregation_step.run_array(chosen_policy = personalization_vector_aggregation_policy)
+
+        t0 = time.perf_counter()
+        grid = list(itertools.product(alphas, betas, damping_factors))
+        print(f"Evaluating {len(grid)} grid points....")
+        self.results = self.run_sweep(grid)
+        print("Time for evaluating the grid:", time.perf_counter() - t0)
+
+        if output_file_path != None:
+            self.save_results(output_file_path)
+
+        end_time = time.perf_counter()
+        self.total_runtime_seconds=end_time-start_time
+        print(f"Done! Total execution time: {self.total_runtime_seconds:.2f} seconds.")
+
+
+    def run_sweep(self, grid):
+
+        networks_per_beta = {}
+        solutions = []
+        results = []
+
+        for alpha, beta, damping_factor in grid:
+
+            if beta not in networks_per_beta:
+                networks_per_beta[beta] = SparseNetwork(beta * self.P + (1 - beta) * self.C, self.nodes)
+
+            core = SparsePageRankCore(self.p_0_per_alpha[alpha], networks_per_beta[beta],
+                damping_factor = damping_factor,
+                solver = self.solver,
+                initial_vector = self.closest_solution(solutions, (alpha, beta, damping_factor)))
+
+            ranked_list = core.run()
+            solutions.append(((alpha, beta, damping_factor), core.page_rank_vector))
+
+            result = {
+                "alpha": alpha,
+                "beta": beta,
+                "damping_factor": damping_factor,
+                "iterations": core.iterations,
+                "residual": core.residual,
+                "ranked_list": ranked_list,
+            }
+
+            if self.reference_genes != None:
+                ranked_genes = [gene for gene, _ in ranked_list]
+                result["recall"] = recall_at_k(ranked_genes, self.reference_genes, k = self.top_k)
+                result["ndcg"] = ndcg_at_k(ranked_genes, self.reference_genes, k = self.top_k)
+
+            results.append(result)
+
+        return results
+
+
+    def closest_solution(self, solutions, parameters):
+        """ Solution of the closest grid point already solved, among the points
+        with the same alpha when there are any: a different personalization
+        vector moves the solution more than a different beta or damping factor.
+        """
+        same_alpha = [solution for solution in solutions if solution[0][0] == parameters[0]]
+        if len(same_alpha) > 0:
+            solutions = same_alpha
+
+        if len(solutions) == 0:
+            return None
+
+        def distance(solution):
+            return sum((a - b) ** 2 for a, b in zip(solution[0], parameters))
+
+        return min(solutions, key = distance)[1]
+
+
+    def save_results(self, file_path):
+
+        header = ["Alpha", "Beta", "DampingFactor", "Iterations", "Residual"]
+        if self.reference_genes != None:
+            header += [f"Recall@{self.top_k}", f"nDCG@{self.top_k}"]
+        header += [f"Top{self.top_k}"]
+
+        with open(file_path, 'w', newline = '') as fp:
+            csv_writer = csv.writer(fp, delimiter = "\t")
+            csv_writer.writerow(header)
+
+            for result in self.results:
+                row = [result["alpha"], result["beta"], result["damping_factor"], result["iterations"], result["residual"]]
+                if self.reference_genes != None:
+                    row += [result["recall"], result["ndcg"]]
+                row += [",".join(gene for gene, _ in result["ranked_list"][:self.top_k])]
+
+                csv_writer.writerow(row)
@@ -0,0 +1,86 @@
+import numpy as np
+import scipy.sparse as sp
+
+from improved_pagerank.core.sparse_page_rank_core import SparsePageRankCore, CONV_THRESHOLD
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+from improved_pagerank.matrix_creation.convex_combination_operator import ConvexCombinationOperator
+from improved_pagerank.personalization_vector_creation.sparse_personalization_vector import SparsePersonalizationVector
+
+class BatchedPageRankCore(SparsePageRankCore):
+    """ Solves one personalized PageRank per personalization vector over a
+    shared transition matrix. The vectors are stacked as the columns of an
+    N x K matrix and iterated together with sparse x dense products; each
+    column leaves the batch as soon as it has converged.
+
+    When every vector is a SparsePersonalizationVector, they are kept as a
+    sparse N x K matrix and only the iterate is dense.
+
+    With max_iterations, every column stops after that many iterations;
+    converged then tells, per column, whether it converged first.
+    """
+    def __init__(self,
+                 personalization_vectors,
+                 G,
+                 damping_factor=0.85,
+                 max_iterations=None):
+        self.damping_factor = damping_factor
+        self.solver = "power"
+        self.max_iterations = max_iterations
+
+        if isinstance(G, (SparseNetwork, ConvexCombinationOperator)):
+            self.network = G
+        else:
+            self.network = SparseNetwork.from_graph(G)
+
+        assert len(personalization_vectors) > 0, "No personalization vector to rank"
+        if all(isinstance(p_v, SparsePersonalizationVector) for p_v in personalization_vectors):
+            self.personalization_vectors = self.__stack_sparse__(personalization_vectors)
+        else:
+            self.personalization_vectors = np.column_stack([self.__set_up_personalization_vector__(p_v) for p_v in personalization_vectors])
+
+        self.transition_matrix_T = self.__transition_matrix_T__()
+
+    def run(self):
+        teleport = (1 - self.damping_factor) * self.personalization_vectors
+        p_v = self.personalization_vectors.toarray() if sp.issparse(self.personalization_vectors) else self.personalization_vectors.copy()
+
+        active = np.arange(p_v.shape[1])
+        self.iterations = np.zeros(p_v.shape[1], dtype=int)
+        self.converged = np.zeros(p_v.shape[1], dtype=bool)
+
+        while active.size > 0:
+            p_t = p_v[:, active]
+            p_t_1 = self.__compute_next_page_rank__(p_t, teleport[:, active])
+            diff_norms = np.abs(p_t_1 - p_t).sum(axis=0)
+
+            p_v[:, active] = p_t_1
+            self.iterations[active] += 1
+            self.converged[active[diff_norms <= CONV_THRESHOLD]] = True
+            active = active[diff_norms > CONV_THRESHOLD]
+
+            if self.max_iterations is not None:
+                active = active[self.iterations[active] < self.max_iterations]
+
+        self.page_rank_vectors = p_v
+        return [self.__generate_ranked_list__(p_v[:, k]) for k in range(p_v.shape[1])]
+
+    def __stack_sparse__(self, personalization_vectors):
+        n = self.network.number_of_nodes()
+        for p_v in personalization_vectors:
+            assert p_v.size == n, "personalization vector is not aligned with the network nodes"
+
+        indptr = np.concatenate([[0], np.cumsum([p_v.nnz for p_v in personalization_vectors])])
+        return sp.csc_matrix((
+            np.concatenate([p_v.values for p_v in personalization_vectors]).astype(self.network.dtype),
+            np.concatenate([p_v.indices for p_v in personalization_vectors]),
+            indptr), shape=(n, len(personalization_vectors)))
+
+    def __compute_next_page_rank__(self, p_t, teleport):
+        if not sp.issparse(teleport):
+            return super().__compute_next_page_rank__(p_t, teleport)
+
+        # the sparse teleport is added to its non-zero entries only
+        p_t_1 = self.damping_factor * self.transition_matrix_T.dot(p_t)
+        teleport = teleport.tocoo()
+        p_t_1[teleport.row, teleport.col] += teleport.data
+        return p_t_1
@@ -0,0 +1,518 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+from improved_pagerank.matrix_creation.convex_combination_operator import ConvexCombinationOperator
+from improved_pagerank.core.local_push_page_rank_core import forward_push
+from improved_pagerank.personalization_vector_creation.sparse_personalization_vector import SparsePersonalizationVector
+
+CONV_THRESHOLD = 0.000001
+
+# power iterations between two extrapolation steps
+EXTRAPOLATION_PERIOD = 10
+
+# inner iterations of a GMRES restart cycle
+GMRES_RESTART = 20
+
+SOLVERS = ["power", "aitken", "quadratic", "gauss_seidel", "gmres", "bicgstab"]
+
+class SparsePageRankCore:
+    """ Same walk as PageRankCore, computed on a row-normalized CSR transition
+    matrix that is built once instead of re-walking the networkx graph.
+
+    The fixed point can be reached with different solvers:
+        power         plain power iteration (same steps as PageRankCore)
+        aitken        power iteration with periodic Aitken extrapolation
+        quadratic     power iteration with periodic quadratic extrapolation
+        gauss_seidel  Gauss-Seidel sweeps on (I - dP^T) x = (1 - d) p
+        gmres         GMRES on the same linear system, Jacobi preconditioned
+        bicgstab      BiCGSTAB on the same linear system, Jacobi preconditioned
+    After run(), iterations and residual (L1 norm of x - dP^T x - (1 - d) p)
+    are available to compare the solvers on a network; converged is False
+    when max_iterations stopped the solver first.
+
+    initial_vector warm-starts the solvers from a previous solution (for
+    instance a nearby point of a parameter sweep) instead of from p.
+
+    With top_k, run() returns only the k best genes, picked with a partial
+    selection. The power-iteration solvers then also stop as soon as the
+    top-k set and order are certified: every gap between consecutive scores
+    down to the (k+1)-th is larger than twice the remaining error bound
+    (d / (1 - d) times the last L1 step). With top_k_stable_iterations, they
+    also stop once the ordered top-k has not changed for that many
+    iterations, which is faster but only empirical.
+
+    update() applies an edge delta to the network and corrects a previous
+    solution by pushing only the residual the delta creates.
+
+    G can also be a ConvexCombinationOperator, whose transition matrix is
+    only applied, never built. gauss_seidel and update() need the stored
+    matrix and are not available then.
+    """
+    def __init__(self,
+                 personalization_vector,
+                 G,
+                 damping_factor=0.85,
+                 solver="power",
+                 max_iterations=None,
+                 initial_vector=None,
+                 top_k=None,
+                 top_k_stable_iterations=None):
+        assert solver in SOLVERS, "Unknown solver " + str(solver)
+
+        self.damping_factor = damping_factor
+        self.solver = solver
+        self.max_iterations = max_iterations
+        self.top_k = top_k
+        self.top_k_stable_iterations = top_k_stable_iterations
+
+        if isinstance(G, (SparseNetwork, ConvexCombinationOperator)):
+            self.network = G
+        else:
+            self.network = SparseNetwork.from_graph(G)
+
+        self.personalization_vector = self.__set_up_personalization_vector__(personalization_vector)
+
+        if initial_vector is not None:
+            self.initial_vector = self.__set_up_personalization_vector__(initial_vector)
+        else:
+            self.initial_vector = self.personalization_vector
+
+        self.transition_matrix_T = self.__transition_matrix_T__()
+
+    def __transition_matrix_T__(self):
+        if isinstance(self.network, ConvexCombinationOperator):
+            assert self.solver != "gauss_seidel", "gauss_seidel needs the aggregated network built, see to_network()"
+            return self.network.transition_operator_T()
+
+        # p^T P is computed as P^T p, so keep the transposed matrix in CSR
+        return self.network.transition_matrix().T.tocsr()
+
+    def __set_up_personalization_vector__(self, personalization_vector):
+        if isinstance(personalization_vector, dict):
+            p = np.zeros(self.network.number_of_nodes(), dtype=self.network.dtype)
+
+            for node, score in personalization_vector.items():
+                index = self.network.node_index.get(node)
+                if index is not None:
+                    p[index] = score
+            return p
+
+        if isinstance(personalization_vector, SparsePersonalizationVector):
+            assert personalization_vector.size == self.network.number_of_nodes(), "personalization vector is not aligned with the network nodes"
+            return personalization_vector.to_array(dtype=self.network.dtype)
+
+        p = np.asarray(personalization_vector, dtype=self.network.dtype)
+        assert p.shape == (self.network.number_of_nodes(),), "personalization vector is not aligned with the network nodes"
+        return p
+
+    def __compute_next_page_rank__(self, p_t, teleport):
+        return self.damping_factor * self.transition_matrix_T.dot(p_t) + teleport
+
+    def __generate_ranked_list__(self, page_rank_vector):
+        # stable sort keeps ties in node order, as sorted() does on the dict version
+        order = np.argsort(-page_rank_vector, kind="stable")
+        nodes = np.array(self.network.nodes, dtype=object)
+        return list(zip(nodes[order].tolist(), page_rank_vector[order].tolist()))
+
+    def __top_k_indices__(self, page_rank_vector, k):
+        # O(N) partial selection, then only the k selected scores are sorted
+        k = min(k, len(page_rank_vector))
+        if k < len(page_rank_vector):
+            candidates = np.argpartition(-page_rank_vector, k - 1)[:k]
+        else:
+            candidates = np.arange(len(page_rank_vector))
+        return candidates[np.lexsort((candidates, -page_rank_vector[candidates]))]
+
+    def __generate_top_k_list__(self, page_rank_vector):
+        nodes = self.network.nodes
+        return [(nodes[index], float(page_rank_vector[index])) for index in self.__top_k_indices__(page_rank_vector, self.top_k)]
+
+    def __top_k_is_certified__(self, p_t, error_bound):
+        scores = p_t[self.__top_k_indices__(p_t, self.top_k + 1)]
+        return bool(np.all(scores[:-1] - scores[1:] > 2 * error_bound))
+
+    def __norm_residual__(self, p_t):
+        teleport = (1 - self.damping_factor) * self.personalization_vector
+        return np.abs(self.__compute_next_page_rank__(p_t, teleport) - p_t).sum()
+
+    def __reached_max_iterations__(self):
+        return self.max_iterations is not None and self.iterations >= self.max_iterations
+
+    def __run_power_iteration__(self, extrapolation=None):
+        teleport = (1 - self.damping_factor) * self.personalization_vector
+        p_v = self.initial_vector.copy()
+        previous = []
+        diff_norm = 1
+        self.converged = False
+        stable_top_k = None
+        stable_iterations = 0
+
+        while diff_norm > CONV_THRESHOLD and not self.__reached_max_iterations__():
+            p_t_1 = self.__compute_next_page_rank__(p_v, teleport)
+            diff_norm = np.abs(p_t_1 - p_v).sum()
+            self.iterations += 1
+
+            # ||x - p_t_1||_1 <= d / (1 - d) ||p_t_1 - p_v||_1 for a contraction of factor d
+            error_bound = self.damping_factor / (1 - self.damping_factor) * diff_norm
+
+            if extrapolation is not None:
+                previous = (previous + [p_v])[-4:]
+
+                if self.iterations % EXTRAPOLATION_PERIOD == 0 and len(previous) == 4:
+                    if extrapolation == "aitken":
+                        extrapolated = self.__aitken_extrapolation__(previous[-4], previous[-2], p_t_1)
+                    else:
+                        extrapolated = self.__quadratic_extrapolation__(previous[-3], previous[-2], previous[-1], p_t_1)
+
+                    # keep the extrapolated vector only if it is closer to the fixed point
+                    # than the next power step is expected to be
+                    extrapolated_norm = self.__norm_residual__(extrapolated)
+                    if extrapolated_norm < self.damping_factor * diff_norm:
+                        p_t_1 = extrapolated
+                        diff_norm = extrapolated_norm
+                        error_bound = extrapolated_norm / (1 - self.damping_factor)
+
+            p_v = p_t_1
+
+            if self.top_k is not None:
+                if self.__top_k_is_certified__(p_v, error_bound):
+                    self.top_k_stopping = "certified"
+                    self.converged = True
+                    break
+
+                if self.top_k_stable_iterations is not None:
+                    top_k = self.__top_k_indices__(p_v, self.top_k)
+                    if stable_top_k is not None and np.array_equal(top_k, stable_top_k):
+                        stable_iterations += 1
+                    else:
+                        stable_iterations = 0
+                    stable_top_k = top_k
+
+                    if stable_iterations >= self.top_k_stable_iterations:
+                        self.top_k_stopping = "stable"
+                        self.converged = True
+                        break
+
+        self.converged = self.converged or diff_norm <= CONV_THRESHOLD
+        return p_v
+
+    def __aitken_extrapolation__(self, p_2, p_1, p_0):
+        # Aitken delta^2 on the difference sequence of every other iterate:
+        # the ratio of two successive differences estimates the dominant
+        # eigenvalue, and two-step differences keep the oscillating modes of
+        # undirected networks (negative eigenvalues) from cancelling it out
+        first_difference = p_0 - p_1
+        previous_difference = p_1 - p_2
+
+        denominator = previous_difference.dot(previous_difference)
+        if denominator == 0.0:
+            return p_0
+
+        ratio = first_difference.dot(previous_difference) / denominator
+        if not 0.0 <= ratio < 1.0:
+            return p_0
+
+        extrapolated = p_0 + ratio / (1 - ratio) * first_difference
+
+        return self.__rescale_extrapolation__(extrapolated, p_0)
+
+    def __quadratic_extrapolation__(self, p_3, p_2, p_1, p_0):
+        # Kamvar et al., "Extrapolation Methods for Accelerating PageRank Computations"
+        y = np.column_stack([p_2 - p_3, p_1 - p_3, p_0 - p_3])
+        gamma, *_ = np.linalg.lstsq(y[:, :2], -y[:, 2], rcond=None)
+        gamma_1, gamma_2, gamma_3 = gamma[0], gamma[1], 1.0
+
+        extrapolated = (gamma_1 + gamma_2 + gamma_3) * p_2 + (gamma_2 + gamma_3) * p_1 + gamma_3 * p_0
+
+        return self.__rescale_extrapolation__(extrapolated, p_0)
+
+    def __rescale_extrapolation__(self, extrapolated, p_0):
+        # scores are probabilities: drop components that overshoot below zero and
+        # keep the mass of the last iterate, otherwise the error moves to the slowest mode
+        extrapolated = np.where(extrapolated < 0, p_0, extrapolated)
+        return extrapolated * (p_0.sum() / extrapolated.sum())
+
+    def __linear_system__(self):
+        # (I - d P^T) x = (1 - d) p
+        n = self.network.number_of_nodes()
+        b = (1 - self.damping_factor) * self.personalization_vector
+
+        if isinstance(self.transition_matrix_T, spla.LinearOperator):
+            A = spla.LinearOperator((n, n), matvec=lambda x: x - self.damping_factor * self.transition_matrix_T.dot(x), dtype=b.dtype)
+            return A, b
+
+        A = (sp.identity(n, format="csr") - self.damping_factor * self.transition_matrix_T).tocsr()
+        return A, b
+
+    def __run_gauss_seidel__(self):
+        A, b = self.__linear_system__()
+        lower = sp.tril(A, format="csr")
+        upper = sp.triu(A, k=1, format="csr")
+
+        p_v = self.initial_vector.copy()
+        diff_norm = 1
+
+        while diff_norm > CONV_THRESHOLD and not self.__reached_max_iterations__():
+            p_t_1 = spla.spsolve_triangular(lower, b - upper.dot(p_v), lower=True)
+            diff_norm = np.abs(p_t_1 - p_v).sum()
+            p_v = p_t_1
+            self.iterations += 1
+
+        self.converged = diff_norm <= CONV_THRESHOLD
+        return p_v
+
+    def __run_krylov__(self):
+        A, b = self.__linear_system__()
+        n = self.network.number_of_nodes()
+
+        # Jacobi preconditioner, the diagonal is 1 unless the node has a self loop
+        if isinstance(A, spla.LinearOperator):
+            inverse_diagonal = 1.0 / (1 - self.damping_factor * self.network.transition_diagonal())
+        else:
+            inverse_diagonal = 1.0 / A.diagonal()
+        preconditioner = spla.LinearOperator((n, n), matvec=lambda x: inverse_diagonal * x, dtype=b.dtype)
+
+        # ||r||_1 <= sqrt(n) ||r||_2, so this keeps the L1 residual under CONV_THRESHOLD
+        atol = CONV_THRESHOLD / np.sqrt(n)
+
+        def count_iteration(_):
+            self.iterations += 1
+
+        p_v = self.initial_vector.copy()
+
+        if self.solver == "gmres":
+            # scipy's maxiter counts restart cycles, so the cycles are run one at a
+            # time to stop after max_iterations inner iterations like the other solvers
+            info = 1
+            while info > 0 and not self.__reached_max_iterations__():
+                restart = GMRES_RESTART
+                if self.max_iterations is not None:
+                    restart = min(restart, self.max_iterations - self.iterations)
+
+                p_v, info = spla.gmres(A, b, x0=p_v, rtol=0.0, atol=atol, M=preconditioner, restart=restart,
+                                       maxiter=1, callback=count_iteration, callback_type="pr_norm")
+        else:
+            p_v, info = spla.bicgstab(A, b, x0=p_v, rtol=0.0, atol=atol, M=preconditioner,
+                                      maxiter=self.max_iterations, callback=count_iteration)
+
+        assert info >= 0, self.solver + " failed on the PageRank linear system"
+        self.converged = info == 0
+        return p_v
+
+    def run(self):
+        self.iterations = 0
+        self.top_k_stopping = None
+
+        if self.solver == "power":
+            p_v = self.__run_power_iteration__()
+        elif self.solver in ["aitken", "quadratic"]:
+            p_v = self.__run_power_iteration__(extrapolation=self.solver)
+        elif self.solver == "gauss_seidel":
+            p_v = self.__run_gauss_seidel__()
+        else:
+            p_v = self.__run_krylov__()
+
+        self.residual = self.__norm_residual__(p_v)
+        self.page_rank_vector = p_v
+
+        if self.top_k is not None:
+            return self.__generate_top_k_list__(p_v)
+        return self.__generate_ranked_list__(p_v)
+
+    def __replace_entries__(self, matrix, removed, removed_rows, rows, cols, values, n):
+        """ (n, n) CSR matrix without the entries at positions removed (in
+        rows removed_rows) and with the entries (rows, cols, values) appended
+        to their rows. Only the touched entries are looked at; the rest of the
+        arrays is moved with a delete and an insert.
+        """
+        indptr = np.concatenate([matrix.indptr, np.full(n + 1 - len(matrix.indptr), matrix.indptr[-1])])
+
+        indptr = indptr - np.concatenate([[0], np.cumsum(np.bincount(removed_rows, minlength=n))])
+        indices = np.delete(matrix.indices, removed)
+        data = np.delete(matrix.data, removed)
+
+        # np.insert places each entry before the given position: the end of its row
+        order = np.argsort(rows, kind="stable")
+        rows, cols, values = rows[order], cols[order], values[order]
+        indices = np.insert(indices, indptr[rows + 1], cols.astype(indices.dtype))
+        data = np.insert(data, indptr[rows + 1], values.astype(data.dtype))
+        indptr = indptr + np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n))])
+
+        return sp.csr_matrix((data, indices, indptr.astype(matrix.indptr.dtype)), shape=(n, n))
+
+    def __row_entries__(self, matrix, rows):
+        """ Positions, row and column of every stored entry of the given rows. """
+        starts = matrix.indptr[rows]
+        counts = matrix.indptr[rows + 1] - starts
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return positions, np.repeat(rows, counts), matrix.indices[positions]
+
+    def __apply_edge_delta__(self, edge_delta, undirected):
+        """ Apply the delta to the network and to the transition matrices,
+        touching only the rows (source nodes) whose outgoing edges changed.
+        Returns the transition entries of those rows before and after.
+        """
+        changes = {}
+
+        for source, target, weight in edge_delta.get("added", []) + edge_delta.get("reweighted", []):
+            changes[(source, target)] = weight
+            if undirected:
+                changes[(target, source)] = weight
+
+        for source, target in edge_delta.get("removed", []):
+            changes[(source, target)] = 0.0
+            if undirected:
+                changes[(target, source)] = 0.0
+
+        # the network may be shared with the caller, so it is replaced rather than modified
+        nodes = list(self.network.nodes)
+        node_index = dict(self.network.node_index)
+        for edge in changes:
+            for node in edge:
+                if node not in node_index:
+                    node_index[node] = len(nodes)
+                    nodes.append(node)
+
+        n = len(nodes)
+        adjacency = self.network.adjacency
+        n_previous = adjacency.shape[0]
+
+        changes_per_row = {}
+        for (source, target), weight in changes.items():
+            changes_per_row.setdefault(node_index[source], {})[node_index[target]] = weight
+        changed_rows = np.array(sorted(changes_per_row), dtype=np.int64)
+
+        # new content of the changed rows of the adjacency
+        old_rows = changed_rows[changed_rows < n_previous]
+        positions, old_entry_rows, old_entry_cols = self.__row_entries__(adjacency, old_rows)
+        old_weights = adjacency.data[positions]
+        row_weights = {row: {} for row in changed_rows.tolist()}
+        for row, col, weight in zip(old_entry_rows.tolist(), old_entry_cols.tolist(), old_weights.tolist()):
+            row_weights[row][col] = weight
+        for row, row_changes in changes_per_row.items():
+            row_weights[row].update(row_changes)
+
+        new_rows = []
+        new_cols = []
+        new_weights = []
+        for row in changed_rows.tolist():
+            for col, weight in row_weights[row].items():
+                if weight != 0.0:
+                    new_rows.append(row)
+                    new_cols.append(col)
+                    new_weights.append(weight)
+
+        new_rows = np.array(new_rows, dtype=np.int64)
+        new_cols = np.array(new_cols, dtype=np.int64)
+        new_weights = np.array(new_weights, dtype=adjacency.dtype)
+
+        self.network = SparseNetwork(self.__replace_entries__(adjacency, positions, old_entry_rows, new_rows, new_cols, new_weights, n), nodes)
+
+        # transition entries of the changed rows, before and after
+        def normalize(rows, weights):
+            out_weights = np.bincount(rows, weights=weights, minlength=n)[rows]
+            values = np.zeros_like(weights)
+            np.divide(weights, out_weights, out=values, where=out_weights != 0.0)
+            return values
+
+        old_values = normalize(old_entry_rows, old_weights)
+        new_values = normalize(new_rows, new_weights)
+
+        # the row-major copy only exists once a push update needed it
+        if hasattr(self, "transition_matrix"):
+            positions, entry_rows, _ = self.__row_entries__(self.transition_matrix, old_rows)
+            self.transition_matrix = self.__replace_entries__(self.transition_matrix, positions, entry_rows,
+                                                              new_rows, new_cols, new_values, n)
+
+        # in P^T the old entries sit in the rows of their targets, under the column of their source
+        target_rows = np.unique(old_entry_cols)
+        positions, entry_rows, entry_cols = self.__row_entries__(self.transition_matrix_T, target_rows)
+        stale = np.isin(entry_cols, old_rows)
+
+        self.transition_matrix_T = self.__replace_entries__(self.transition_matrix_T, positions[stale], entry_rows[stale],
+                                                            new_cols, new_rows, new_values, n)
+
+        return (old_entry_rows, old_entry_cols, old_values), (new_rows, new_cols, new_values)
+
+    def update(self, edge_delta, previous_solution=None, undirected=True, tolerance=None):
+        """ Update the scores after an edge delta instead of solving again.
+
+        edge_delta is a dict with any of the keys
+            "added":      [(u, v, weight), ...]
+            "removed":    [(u, v), ...]
+            "reweighted": [(u, v, new_weight), ...]
+        applied in both directions when undirected is set, as the Loader
+        stores undirected networks. Nodes that are new to the network are
+        added with a zero personalization score. Only the changed rows of the
+        adjacency and of the transition matrices are rewritten.
+
+        previous_solution (a dict node -> score, a ranked list or an array
+        covering every node) defaults to the last computed vector; top-k
+        lists are rejected. By default the solver is then run again warm-
+        started from it, to the same accuracy as run(): a small delta moves
+        the solution little, so this takes a fraction of the iterations (10
+        instead of 29 for a few HIPPIE edges).
+
+        With a push tolerance, the solution is instead corrected locally: with
+        x the previous solution, the new fixed point is
+        x + (I - dP'^T)^{-1} r with r = d (P' - P)^T x, non-zero only around
+        the rows the delta touched, and that correction is computed by forward
+        push from there. update_error_bound is the L1 bound left by the push;
+        reaching CONV_THRESHOLD this way costs more than the warm start on
+        small-world networks.
+        """
+        assert isinstance(self.network, SparseNetwork), "update() needs the aggregated network built, see to_network()"
+        n_previous = self.network.number_of_nodes()
+
+        if previous_solution is None:
+            previous_solution = self.page_rank_vector
+        elif isinstance(previous_solution, list):
+            assert len(previous_solution) == n_previous, "previous_solution must rank every node, not only the top k"
+            previous_solution = dict(previous_solution)
+
+        if isinstance(previous_solution, dict):
+            assert len(previous_solution) == n_previous, "previous_solution must score every node"
+
+        # the push updates the estimate in place, never on the caller's array
+        p_v = self.__set_up_personalization_vector__(previous_solution).copy()
+
+        (old_rows, old_cols, old_values), (new_rows, new_cols, new_values) = self.__apply_edge_delta__(edge_delta, undirected)
+
+        n = self.network.number_of_nodes()
+        if n > n_previous:
+            p_v = np.concatenate([p_v, np.zeros(n - n_previous, dtype=p_v.dtype)])
+            self.personalization_vector = np.concatenate([self.personalization_vector, np.zeros(n - n_previous, dtype=p_v.dtype)])
+            self.initial_vector = self.personalization_vector
+
+        if tolerance is None:
+            initial_vector = self.initial_vector
+            self.initial_vector = p_v
+
+            ranked_list = self.run()
+
+            self.initial_vector = initial_vector
+            return ranked_list
+
+        # forward push reads the rows of P
+        if not hasattr(self, "transition_matrix"):
+            self.transition_matrix = self.transition_matrix_T.T.tocsr()
+
+        # r = d (P' - P)^T x only involves the changed rows
+        residual = np.zeros(n, dtype=p_v.dtype)
+        np.add.at(residual, new_cols, self.damping_factor * p_v[new_rows] * new_values)
+        np.subtract.at(residual, old_cols, self.damping_factor * p_v[old_rows] * old_values)
+
+        # forward push adds (1 - d) of each pushed residual to the estimate
+        residual /= (1 - self.damping_factor)
+
+        active = np.unique(np.concatenate([new_cols, old_cols]))
+        self.pushes = forward_push(self.transition_matrix, p_v, residual, self.damping_factor, tolerance, active=active)
+        self.update_error_bound = float(np.abs(residual).sum())
+
+        self.page_rank_vector = p_v
+
+        if self.top_k is not None:
+            return self.__generate_top_k_list__(p_v)
+        return self.__generate_ranked_list__(p_v)
@@ -0,0 +1,72 @@
+import numpy as np
+import scipy.sparse as sp
+
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+
+CONV_THRESHOLD = 0.000001
+
+class SparsePageRankOri:
+    """ Matrix-backed PageRankOri. Out-degrees (or out-weights when weighted
+    is set) are computed once and every iteration is one sparse mat-vec.
+    The rank held by dangling nodes is spread uniformly, so the vector
+    always sums to one.
+    """
+    def __init__(self,
+                 G,
+                 restart_prob=0.85,
+                 weighted=False):
+
+        self.restart_prob = restart_prob
+        self.weighted = weighted
+
+        if isinstance(G, SparseNetwork):
+            self.network = G
+        else:
+            self.network = SparseNetwork.from_graph(G, default_weight=1.0)
+
+        self.__build_transition_matrix__()
+
+    def __build_transition_matrix__(self):
+        adjacency = self.network.adjacency
+
+        if not self.weighted:
+            # PageRankOri only looks at out_degree, the weights are not used
+            adjacency = adjacency.copy()
+            adjacency.data = np.ones_like(adjacency.data)
+
+        out_weights = np.asarray(adjacency.sum(axis=1)).ravel()
+        self.dangling_nodes = out_weights == 0.0
+
+        scaling = np.zeros_like(out_weights)
+        np.divide(1.0, out_weights, out=scaling, where=~self.dangling_nodes)
+
+        self.transition_matrix_T = sp.diags(scaling).dot(adjacency).T.tocsr()
+
+    def __compute_next_page_rank__(self, p_t):
+        damping_factor = self.restart_prob
+        n = len(p_t)
+
+        dangling_mass = p_t[self.dangling_nodes].sum()
+        teleport = ((1 - damping_factor) + damping_factor * dangling_mass) / n
+
+        return damping_factor * self.transition_matrix_T.dot(p_t) + teleport
+
+    def __generate_ranked_list__(self, page_rank_vector):
+        order = np.argsort(-page_rank_vector, kind="stable")
+        nodes = self.network.nodes
+        return [[nodes[index], float(page_rank_vector[index])] for index in order]
+
+    def run(self):
+        n = self.network.number_of_nodes()
+        p_v = np.full(n, 1 / n, dtype=self.network.dtype)
+        diff_norm = 1
+        self.iterations = 0
+
+        while diff_norm > CONV_THRESHOLD:
+            p_t_1 = self.__compute_next_page_rank__(p_v)
+            diff_norm = np.abs(p_t_1 - p_v).sum()
+            p_v = p_t_1
+            self.iterations += 1
+
+        self.page_rank_vector = p_v
+        return self.__generate_ranked_list__(p_v)
@@ -0,0 +1,20 @@
+import numpy as np
+
+# Same definitions as data_xac_thuc.py: recall over the whole reference set,
+# and an nDCG whose ideal ranking has a relevant gene at every position.
+
+def recall_at_k(ranked_genes, reference_genes, k = 100):
+    top_k_genes = ranked_genes[:k]
+    common_genes = [gene for gene in top_k_genes if gene in reference_genes]
+
+    return len(common_genes) / len(reference_genes)
+
+
+def ndcg_at_k(ranked_genes, reference_genes, k = 100):
+    top_k_genes = ranked_genes[:k]
+    rel = [1 if gene in reference_genes else 0 for gene in top_k_genes]
+
+    dcg = sum(rel[i] / np.log2(i + 2) for i in range(len(rel)))
+    idcg = sum(1 / np.log2(i + 2) for i in range(k))
+
+    return dcg / idcg if idcg > 0 else 0
@@ -1,12 +1,19 @@
+import numpy as np
+import scipy.sparse as sp
 import networkx as nx
+
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+
 class ComputePPIGraphWeight():
 	
-	def __init__(self, G, disease_ontology = None, map__gene__ontologies = None, c = 1):
+	def __init__(self, G, disease_ontology = None, map__gene__ontologies = None, c = 1, ontology_incidence = None, shared_annotation_index = None):
 
 		self.constant = c
 		self.PPI = G
 		self.disease_ontology = disease_ontology
 		self.map__gene__ontologies = map__gene__ontologies
+		self.ontology_incidence = ontology_incidence
+		self.shared_annotation_index = shared_annotation_index
 
 	def _get_edge_relevance(self, source, target, database_source, current_disease_ontology):
 
@@ -36,6 +43,115 @@ class ComputePPIGraphWeight():
 
 		return weighted_PPI
 
+	def compute_weight_on_sparse_network(self,):
+		""" compute_weight_on_graph for a SparseNetwork PPI, with the annotations
+		given as an OntologyIncidence.
+
+		Y stacks the disease-term columns of every database's incidence, so the
+		number of disease terms u and v share is the dot product of rows u and
+		v of Y. It is computed once per undirected pair and written to both
+		directions, on the CSR structure of the PPI. With a SharedAnnotationIndex
+		of the PPI, the counts are one mat-vec against the disease terms.
+		"""
+		if self.shared_annotation_index != None:
+			assert self.disease_ontology != None, "Not enough input parameter for computing PPI biological weight"
+			return self.shared_annotation_index.weights(self.disease_ontology, c = self.constant, dtype = self.PPI.dtype)
+
+		assert self.disease_ontology != None and self.ontology_incidence != None, "Not enough input parameter for computing PPI biological weight"
+
+		adjacency = self.PPI.adjacency
+		n = self.PPI.number_of_nodes()
+
+		incidence = self.ontology_incidence.aligned(self.PPI.nodes)
+		disease_columns = [incidence.incidence[db][:, np.flatnonzero(indicator)]
+			for db, indicator in incidence.disease_indicators(self.disease_ontology).items()]
+
+		rows = np.repeat(np.arange(n, dtype = np.int64), np.diff(adjacency.indptr))
+		cols = adjacency.indices.astype(np.int64)
+		pairs, pair_of_edge = np.unique(np.minimum(rows, cols) * n + np.maximum(rows, cols), return_inverse = True)
+
+		shared = np.zeros(len(pairs))
+		if len(disease_columns) > 0:
+			Y = sp.hstack(disease_columns, format = "csr")
+			shared = np.asarray(Y[pairs // n].multiply(Y[pairs % n]).sum(axis = 1)).ravel()
+
+		weights = self.constant + shared[pair_of_edge]
+		assert (weights > 0.0).all(), "nodes or edges not overlapping between G and weighted G"
+
+		# the weights are integers offset by the constant, exact in the PPI's dtype
+		return SparseNetwork(sp.csr_matrix((weights.astype(adjacency.dtype), adjacency.indices, adjacency.indptr), shape = (n, n)), self.PPI.nodes)
+
+	def update_weight_on_sparse_network(self, weighted_PPI, new_disease_ontology):
+		""" Re-weight weighted_PPI, weighted for self.disease_ontology, for
+		new_disease_ontology, which becomes self.disease_ontology.
+
+		Only the edges whose two ends share a term that entered or left the
+		disease ontology are looked at. Returns the re-weighted network and the
+		edges whose weight changed, once per undirected pair, as the
+		[(u, v, weight), ...] "reweighted" delta of SparsePageRankCore.update.
+		"""
+		assert self.disease_ontology != None and (self.ontology_incidence != None or self.shared_annotation_index != None), "Not enough input parameter for computing PPI biological weight"
+
+		if self.shared_annotation_index != None:
+			positions, changes = self.shared_annotation_index.weight_changes(self.disease_ontology, new_disease_ontology)
+		else:
+			positions, changes = self.__weight_changes__(weighted_PPI, new_disease_ontology)
+
+		self.disease_ontology = new_disease_ontology
+
+		adjacency = weighted_PPI.adjacency
+		weights = adjacency.data.copy()
+		weights[positions] += changes
+
+		n = weighted_PPI.number_of_nodes()
+		rows = np.searchsorted(adjacency.indptr, positions, side = "right") - 1
+		cols = adjacency.indices[positions]
+		pairs = rows <= cols
+
+		reweighted = [(weighted_PPI.nodes[row], weighted_PPI.nodes[col], weight)
+			for row, col, weight in zip(rows[pairs].tolist(), cols[pairs].tolist(), weights[positions[pairs]].tolist())]
+
+		return SparseNetwork(sp.csr_matrix((weights, adjacency.indices, adjacency.indptr), shape = (n, n)), weighted_PPI.nodes), reweighted
+
+	def __weight_changes__(self, weighted_PPI, new_disease_ontology):
+		""" CSR positions of weighted_PPI whose weight changes, and the change:
+		the shared changed terms of the two ends, counted +1 for a term that
+		entered the disease ontology and -1 for one that left it.
+		"""
+		adjacency = weighted_PPI.adjacency
+		n = weighted_PPI.number_of_nodes()
+
+		incidence = self.ontology_incidence.aligned(weighted_PPI.nodes)
+		old_indicators = incidence.disease_indicators(self.disease_ontology)
+		new_indicators = incidence.disease_indicators(new_disease_ontology)
+
+		changed_columns = []
+		signs = []
+		for db in incidence.databases:
+			no_terms = np.zeros(len(incidence.terms[db]))
+			change = new_indicators.get(db, no_terms) - old_indicators.get(db, no_terms)
+			changed_terms = np.flatnonzero(change)
+
+			if len(changed_terms) > 0:
+				changed_columns.append(incidence.incidence[db][:, changed_terms])
+				signs.append(change[changed_terms])
+
+		if len(changed_columns) == 0:
+			return np.zeros(0, dtype = np.int64), np.zeros(0)
+
+		Y = sp.hstack(changed_columns, format = "csr")
+		sign = np.concatenate(signs)
+
+		# both ends need one of the changed terms
+		annotated = np.diff(Y.indptr) > 0
+		rows = np.repeat(np.arange(n), np.diff(adjacency.indptr))
+		candidates = np.flatnonzero(annotated[rows] & annotated[adjacency.indices])
+
+		changes = Y[rows[candidates]].multiply(Y[adjacency.indices[candidates]]).dot(sign)
+		changed = changes != 0.0
+
+		return candidates[changed], changes[changed]
+
 
 
 
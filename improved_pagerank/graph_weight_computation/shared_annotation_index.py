@@ -0,0 +1,169 @@
+import os
+import numpy as np
+import scipy.sparse as sp
+
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+
+
+class SharedAnnotationIndex():
+	""" Which annotation terms the two ends of every PPI edge share, kept
+	independently of any disease.
+
+	The rows of shared_terms are the undirected pairs of the PPI, the columns
+	the terms of every database one after the other (terms[db] in the order
+	of databases), with 1.0 where both ends are annotated with the term. The
+	weight compute_weight_on_graph gives an edge for a disease ontology is
+	then c + shared_terms . d, with d the indicator of the disease terms, so
+	weighting for a new cohort is one sparse mat-vec.
+	"""
+
+	def __init__(self, nodes, indptr, indices, pair_of_edge, shared_terms, databases, terms, annotation_digest):
+		# node list and CSR structure of the PPI the weights are written to
+		self.nodes = list(nodes)
+		self.indptr = indptr
+		self.indices = indices
+
+		# row of shared_terms of every CSR entry (both directions of a pair)
+		self.pair_of_edge = pair_of_edge
+		self.shared_terms = shared_terms
+
+		self.databases = list(databases)
+		self.terms = {db: list(terms[db]) for db in self.databases}
+
+		# the annotations the index was built from
+		self.annotation_digest = annotation_digest
+
+
+	@staticmethod
+	def digest(ontology_incidence):
+		""" SHA-256 of the genes, terms and incidence matrices of an OntologyIncidence. """
+		return ontology_incidence.digest()
+
+
+	@classmethod
+	def build(cls, PPI, ontology_incidence):
+		""" Index of a SparseNetwork PPI against an OntologyIncidence. """
+		adjacency = PPI.adjacency
+		n = PPI.number_of_nodes()
+
+		incidence = ontology_incidence.aligned(PPI.nodes)
+
+		rows = np.repeat(np.arange(n, dtype = np.int64), np.diff(adjacency.indptr))
+		cols = adjacency.indices.astype(np.int64)
+		pairs, pair_of_edge = np.unique(np.minimum(rows, cols) * n + np.maximum(rows, cols), return_inverse = True)
+
+		if len(incidence.databases) > 0:
+			X = sp.hstack([incidence.incidence[db] for db in incidence.databases], format = "csr")
+		else:
+			X = sp.csr_matrix((n, 0))
+
+		shared_terms = X[pairs // n].multiply(X[pairs % n]).tocsr()
+
+		return cls(PPI.nodes, adjacency.indptr.copy(), adjacency.indices.copy(), pair_of_edge, shared_terms,
+			incidence.databases, incidence.terms, cls.digest(ontology_incidence))
+
+
+	def matches(self, PPI, ontology_incidence):
+		""" Whether the index was built from this PPI and these annotations. """
+		return (self.nodes == list(PPI.nodes)
+			and np.array_equal(self.indptr, PPI.adjacency.indptr)
+			and np.array_equal(self.indices, PPI.adjacency.indices)
+			and self.annotation_digest == self.digest(ontology_incidence))
+
+
+	def disease_vector(self, disease_ontology):
+		""" Indicator of the disease terms over the columns of shared_terms. """
+		vectors = []
+
+		for db in self.databases:
+			vector = np.zeros(len(self.terms[db]))
+
+			if db in disease_ontology:
+				term_index = {term: index for index, term in enumerate(self.terms[db])}
+				vector[[term_index[term] for term in disease_ontology[db] if term in term_index]] = 1.0
+
+			vectors.append(vector)
+
+		if len(vectors) == 0:
+			return np.zeros(0)
+
+		return np.concatenate(vectors)
+
+
+	def pair_weights(self, disease_ontology, c = 1):
+		""" c + number of shared disease terms, per undirected pair. """
+		return c + self.shared_terms.dot(self.disease_vector(disease_ontology))
+
+
+	def weights(self, disease_ontology, c = 1, dtype = np.float64):
+		""" The weighted PPI for a disease ontology, on the CSR structure of the
+		PPI the index was built from, with weights of the given dtype.
+		"""
+		weights = self.pair_weights(disease_ontology, c = c)[self.pair_of_edge]
+		assert (weights > 0.0).all(), "nodes or edges not overlapping between G and weighted G"
+
+		n = len(self.nodes)
+		return SparseNetwork(sp.csr_matrix((weights.astype(dtype), self.indices, self.indptr), shape = (n, n)), self.nodes)
+
+
+	def weight_changes(self, old_disease_ontology, new_disease_ontology):
+		""" CSR positions whose weight changes from the old disease ontology to
+		the new one, with the change. Only the columns of the terms that
+		entered or left the ontology are read.
+		"""
+		change = self.disease_vector(new_disease_ontology) - self.disease_vector(old_disease_ontology)
+		changed_terms = np.flatnonzero(change)
+
+		pair_change = self.shared_terms[:, changed_terms].dot(change[changed_terms])
+		positions = np.flatnonzero(pair_change[self.pair_of_edge])
+
+		return positions, pair_change[self.pair_of_edge[positions]]
+
+
+	def save(self, file_path):
+		""" Write the index to an .npz file. """
+		with open(file_path, 'wb') as fp:
+			np.savez(fp,
+				nodes = np.asarray(self.nodes, dtype = str),
+				indptr = self.indptr,
+				indices = self.indices,
+				pair_of_edge = self.pair_of_edge,
+				shared_indptr = self.shared_terms.indptr,
+				shared_indices = self.shared_terms.indices,
+				shared_shape = np.asarray(self.shared_terms.shape),
+				databases = np.asarray(self.databases, dtype = str),
+				terms = np.asarray([term for db in self.databases for term in self.terms[db]], dtype = str),
+				term_counts = np.asarray([len(self.terms[db]) for db in self.databases], dtype = np.int64),
+				annotation_digest = np.asarray(self.annotation_digest))
+
+
+	@classmethod
+	def load(cls, file_path):
+		with np.load(file_path, allow_pickle = False) as arrays:
+			shared_indices = arrays["shared_indices"]
+			shared_terms = sp.csr_matrix((np.ones(len(shared_indices)), shared_indices, arrays["shared_indptr"]),
+				shape = tuple(arrays["shared_shape"]))
+
+			databases = arrays["databases"].tolist()
+			offsets = np.concatenate([[0], np.cumsum(arrays["term_counts"])])
+			terms = arrays["terms"].tolist()
+			terms = {db: terms[offsets[position]:offsets[position + 1]] for position, db in enumerate(databases)}
+
+			return cls(arrays["nodes"].tolist(), arrays["indptr"], arrays["indices"], arrays["pair_of_edge"], shared_terms,
+				databases, terms, str(arrays["annotation_digest"]))
+
+
+	@classmethod
+	def load_or_build(cls, file_path, PPI, ontology_incidence):
+		""" The index saved at file_path when it was built from this PPI and
+		these annotations, otherwise a new one, saved there.
+		"""
+		if os.path.exists(file_path):
+			index = cls.load(file_path)
+			if index.matches(PPI, ontology_incidence):
+				return index
+
+		index = cls.build(PPI, ontology_incidence)
+		index.save(file_path)
+
+		return index
@@ -1,6 +1,23 @@
+import os
 import csv
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
 import networkx as nx
 
+from concurrent.futures import ThreadPoolExecutor
+
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+from improved_pagerank.loader.ontology_incidence import OntologyIncidence
+
+# bump when the layout of the cached arrays changes
+CACHE_VERSION = 1
+
 class Loader():
 	def __init__(self, 
 		
@@ -13,6 +30,10 @@ class Loader():
 		disease_ontology_file_path = None,
 		map_gene_ontologies_file_path = None,
 
+		sparse_networks = False,
+		compact = False,
+		cache_dir = None,
+		max_workers = None,
 
 		):
 		if ppi_file_path != None:
@@ -46,6 +67,21 @@ class Loader():
 		else:
 			self.map_gene_ontologies_file_path = None
 
+		# networks are returned as CSR SparseNetworks (load_sparse_graph)
+		# instead of networkx DiGraphs (load_graph), and the gene -> ontologies
+		# map as an OntologyIncidence (load_ontology_incidence)
+		self.sparse_networks = sparse_networks
+
+		# load_sparse_graph returns float32 weights and int32 indices
+		self.compact = compact
+
+		# parsed networks and annotations are kept there as .npy files
+		self.cache_dir = cache_dir
+
+		# run() reads the input files on a pool of this many threads
+		self.max_workers = max_workers
+		self.load_times = {}
+
 
 
 	def run(self,):
@@ -53,90 +89,223 @@ class Loader():
 		assert self.ppi_file_path != None or self.co_expression_file_path != None, "No network as input of Random Walks"
 		assert self.seed_file_path != None, "No Seed as input of Random Walks"
 
-		if self.ppi_file_path != None:
-			PPI = self.load_graph(self.ppi_file_path)
+		if self.sparse_networks:
+			load_network = self.load_sparse_graph
+			load_map__gene__ontologies = self.load_ontology_incidence
 		else:
-			PPI = None
+			load_network = self.load_graph
+			load_map__gene__ontologies = self.load_map__gene__ontologies
+
+		# name -> (load, arguments, input file) for every input file
+		loads = {}
+
+		if self.ppi_file_path != None:
+			loads["PPI"] = (load_network, (self.ppi_file_path,), self.ppi_file_path)
 
 		if self.co_expression_file_path:
-			CO_expression = self.load_graph(self.co_expression_file_path)
-		else:
-			CO_expression = None
-		
-		if self.seed_file_path != None:
-			seed_set = self.load_seed_set(self.seed_file_path)
+			loads["CO_expression"] = (load_network, (self.co_expression_file_path,), self.co_expression_file_path)
 
 		if self.map_gene_ontologies_file_path != None:
-			map__gene__ontologies = self.load_map__gene__ontologies()
-		else:
-			map__gene__ontologies = None
+			loads["map__gene__ontologies"] = (load_map__gene__ontologies, (), self.map_gene_ontologies_file_path)
+
+		if self.secondary_seed_file_path != None:
+			loads["secondary_seed_set"] = (self.load_seed_set, (self.secondary_seed_file_path,), self.secondary_seed_file_path)
 
 		if self.disease_ontology_file_path != None:
-			disease_ontology = self.load_disease_ontology()
-		else:
-			disease_ontology = None
+			loads["disease_ontology"] = (self.load_disease_ontology, (), self.disease_ontology_file_path)
 
-		if self.secondary_seed_file_path != None:
-			secondary_seed_set = self.load_seed_set(self.secondary_seed_file_path)
-		else:
-			secondary_seed_set = None
+		loads["seed_set"] = (self.load_seed_set, (self.seed_file_path,), self.seed_file_path)
+
+		loaded = self.__load_concurrently__(loads)
+
+		PPI = loaded.get("PPI")
+		CO_expression = loaded.get("CO_expression")
+		seed_set = loaded["seed_set"]
+		map__gene__ontologies = loaded.get("map__gene__ontologies")
+		disease_ontology = loaded.get("disease_ontology")
+		secondary_seed_set = loaded.get("secondary_seed_set")
 
 
 		return PPI, CO_expression, seed_set, secondary_seed_set, map__gene__ontologies, disease_ontology
 
 
+	def __load_concurrently__(self, loads):
+		""" Run the independent loads on a thread pool and return name ->
+		result. The pandas parsers release the GIL while they tokenize, so the
+		network files overlap with each other and with the csv readers.
+		Loads are submitted largest input file first, so the longest one starts
+		at once and the total is close to its time. Seconds per load are kept
+		in self.load_times.
+		"""
+		self.load_times = dict.fromkeys(loads)
+
+		def timed(name, load, arguments):
+			t0 = time.perf_counter()
+			result = load(*arguments)
+			self.load_times[name] = time.perf_counter() - t0
+			return result
+
+		with ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+			by_size = sorted(loads, key = lambda name: os.path.getsize(loads[name][2]), reverse = True)
+			futures = {name: executor.submit(timed, name, loads[name][0], loads[name][1]) for name in by_size}
+
+			return {name: future.result() for name, future in futures.items()}
+
+
 	def load_map__gene__ontologies(self):
 		
 		map_gene_ontologies = {}
-		
-		with open(self.map_gene_ontologies_file_path,"r") as fp:
-			csv_reader = csv.reader(fp, delimiter = "\t")
 
-			for index,row in enumerate(csv_reader):
-				if index == 0:
-					continue
-				
-				gene_name = row[0]
-				term_id = row[1]
-				db = row[2]
+		columns = self.load_columns(self.map_gene_ontologies_file_path, ["gene", "term", "db"])
+		genes = columns["gene_table"].tolist()
+		terms = columns["term_table"].tolist()
+		dbs = columns["db_table"].tolist()
 
-				if gene_name in map_gene_ontologies:
-					
-					if db in map_gene_ontologies[gene_name]:
-						map_gene_ontologies[gene_name][db].add(term_id)
-					else:
-						map_gene_ontologies[gene_name][db] = {term_id}
+		for gene_code, term_code, db_code in zip(columns["gene_codes"].tolist(), columns["term_codes"].tolist(), columns["db_codes"].tolist()):
+
+			gene_name = genes[gene_code]
+			term_id = terms[term_code]
+			db = dbs[db_code]
+
+			if gene_name in map_gene_ontologies:
 				
+				if db in map_gene_ontologies[gene_name]:
+					map_gene_ontologies[gene_name][db].add(term_id)
 				else:
-					map_gene_ontologies[gene_name] = {}
 					map_gene_ontologies[gene_name][db] = {term_id}
+			
+			else:
+				map_gene_ontologies[gene_name] = {}
+				map_gene_ontologies[gene_name][db] = {term_id}
 
 		
 		return map_gene_ontologies
 
+	def load_ontology_incidence(self):
+		""" The gene -> ontologies map as one sparse gene x term incidence
+		matrix per database, built from the (cached) columns of the file.
+		"""
+		columns = self.load_columns(self.map_gene_ontologies_file_path, ["gene", "term", "db"])
+
+		return OntologyIncidence.from_columns(columns)
+
 	def load_disease_ontology(self,):
 		disease_ontology = {}
 
-		with open(self.disease_ontology_file_path, 'r') as fp:
-			csv_reader = csv.reader(fp,delimiter = "\t")
+		columns = self.load_columns(self.disease_ontology_file_path, ["ontology", "db"])
+		ontologies = columns["ontology_table"].tolist()
+		dbs = columns["db_table"].tolist()
 
-			for index, row in enumerate(csv_reader):
+		for ontology_code, db_code in zip(columns["ontology_codes"].tolist(), columns["db_codes"].tolist()):
 
-				if index == 0:
-					continue
+			ontology = ontologies[ontology_code]
+			db = dbs[db_code]
 
-				ontology = row[0]
-				db = row[1]
-
-				if db in disease_ontology:
-					disease_ontology[db].add(ontology)
-				else:
-					disease_ontology[db] = {ontology}
+			if db in disease_ontology:
+				disease_ontology[db].add(ontology)
+			else:
+				disease_ontology[db] = {ontology}
 
 		return disease_ontology
 
 
+	def load_columns(self, file_path, names):
+		""" The first len(names) columns of a TSV with a header row, each
+		factorized into int32 codes (name + "_codes") over a table of its
+		distinct values in order of first appearance (name + "_table").
+		Read from the cache when there is one.
+		"""
+		return self.__cached__("columns", file_path, tuple(names),
+			lambda: self.__parse_columns__(file_path, names))
+
+
+	def __parse_columns__(self, file_path, names):
+		table = pd.read_csv(file_path, sep = "\t", header = None, skiprows = 1, usecols = range(len(names)),
+			dtype = str, keep_default_na = False, quoting = csv.QUOTE_NONE)
+
+		columns = {}
+		for position, name in enumerate(names):
+			codes, values = pd.factorize(table[position])
+			columns[name + "_codes"] = codes.astype(np.int32)
+			columns[name + "_table"] = np.asarray(values, dtype = str)
+
+		return columns
+
+
+	def __file_hash__(self, file_path):
+		sha256 = hashlib.sha256()
+
+		with open(file_path, 'rb') as fp:
+			for block in iter(lambda: fp.read(1 << 20), b""):
+				sha256.update(block)
+
+		return sha256.hexdigest()
+
+
+	def __cached__(self, kind, file_path, parameters, parse):
+		""" Arrays produced by parse(), read back memory-mapped from cache_dir
+		when the entry still matches the file.
+
+		An entry is keyed by the kind of parse, its parameters and the
+		absolute file path, and records the size, mtime and SHA-256 of the
+		file it was built from. A changed size invalidates it; a changed
+		mtime only does when the content hash differs as well.
+		"""
+		if self.cache_dir == None:
+			return parse()
+
+		file_path = os.path.abspath(file_path)
+		key = hashlib.sha256(repr((CACHE_VERSION, kind, parameters, file_path)).encode()).hexdigest()
+		entry_path = os.path.join(self.cache_dir, key)
+		meta_path = os.path.join(entry_path, "meta.json")
+
+		stat = os.stat(file_path)
+
+		if os.path.exists(meta_path):
+			with open(meta_path, 'r') as fp:
+				meta = json.load(fp)
+
+			valid = meta["size"] == stat.st_size
+			if valid and meta["mtime_ns"] != stat.st_mtime_ns:
+				valid = meta["sha256"] == self.__file_hash__(file_path)
+
+				if valid:
+					meta["mtime_ns"] = stat.st_mtime_ns
+					with open(meta_path, 'w') as fp:
+						json.dump(meta, fp)
+
+			if valid:
+				return {name: np.load(os.path.join(entry_path, name + ".npy"), mmap_mode = "r") for name in meta["arrays"]}
+
+		arrays = parse()
+
+		# written next to the entry and renamed, so readers never see half of it
+		os.makedirs(self.cache_dir, exist_ok = True)
+		temporary_path = tempfile.mkdtemp(dir = self.cache_dir, prefix = key + ".")
+
+		for name, array in arrays.items():
+			np.save(os.path.join(temporary_path, name + ".npy"), array)
+
+		meta = {"file_path": file_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+			"sha256": self.__file_hash__(file_path), "arrays": list(arrays)}
+		with open(os.path.join(temporary_path, "meta.json"), 'w') as fp:
+			json.dump(meta, fp)
+
+		shutil.rmtree(entry_path, ignore_errors = True)
+		try:
+			os.replace(temporary_path, entry_path)
+		except OSError:
+			# another loader of the same file published its entry first
+			shutil.rmtree(temporary_path, ignore_errors = True)
+
+		return arrays
+
+
 	def load_graph(self,file_path, has_header = True, absolute_policy = True):
+		if self.cache_dir != None:
+			# built from the cached CSR arrays instead of parsing the file again
+			return self.load_sparse_graph(file_path, has_header, absolute_policy).to_graph()
+
 		G = nx.DiGraph()
 
 		with open(file_path, 'r') as fp:
@@ -179,6 +348,66 @@ class Loader():
 		return G
 
 
+	def load_sparse_graph(self, file_path, has_header = True, absolute_policy = True):
+		""" Same network as load_graph, parsed with the pandas C engine into a
+		symmetric CSR SparseNetwork. Nodes are numbered in order of first
+		appearance, as load_graph inserts them, and of the rows giving the
+		same undirected pair only the first one is kept. Call to_graph() on
+		the result when a networkx graph is needed. With compact, the network
+		is the float32 / int32 copy of SparseNetwork.compact().
+
+		With a cache directory, the CSR arrays are memory-mapped from the
+		cache, and the file is only parsed again after it changes.
+		"""
+		arrays = self.__cached__("sparse_graph", file_path, (has_header, absolute_policy),
+			lambda: self.__parse_sparse_graph__(file_path, has_header, absolute_policy))
+
+		n = len(arrays["nodes"])
+		adjacency = sp.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape = (n, n))
+
+		network = SparseNetwork(adjacency, arrays["nodes"].tolist())
+
+		if self.compact:
+			return network.compact()
+		return network
+
+
+	def __parse_sparse_graph__(self, file_path, has_header, absolute_policy):
+		edges = pd.read_csv(file_path, sep = "\t", header = None, skiprows = 1 if has_header else 0,
+			dtype = {0: str, 1: str}, keep_default_na = False, quoting = csv.QUOTE_NONE, float_precision = "round_trip")
+
+		if edges.shape[1] == 3:
+			scores = pd.to_numeric(edges[2], errors = "coerce").fillna(0.0).to_numpy(dtype = np.float64)
+			if absolute_policy:
+				scores = np.abs(scores)
+		else:
+			scores = np.ones(len(edges))
+
+		# interleaving the two columns numbers the nodes in insertion order
+		endpoints = np.column_stack([edges[0].to_numpy(), edges[1].to_numpy()]).ravel()
+		codes, nodes = pd.factorize(endpoints)
+		sources = codes[0::2]
+		targets = codes[1::2]
+
+		n = len(nodes)
+		pairs = np.minimum(sources, targets).astype(np.int64) * n + np.maximum(sources, targets)
+		_, first_rows = np.unique(pairs, return_index = True)
+
+		sources = sources[first_rows]
+		targets = targets[first_rows]
+		scores = scores[first_rows]
+
+		# self-loops are stored once
+		mirrored = sources != targets
+		rows = np.concatenate([sources, targets[mirrored]])
+		cols = np.concatenate([targets, sources[mirrored]])
+		weights = np.concatenate([scores, scores[mirrored]])
+
+		adjacency = sp.csr_matrix((weights, (rows, cols)), shape = (n, n))
+
+		return {"data": adjacency.data, "indices": adjacency.indices, "indptr": adjacency.indptr, "nodes": np.asarray(nodes, dtype = str)}
+
+
 	def load_seed_set(self,file_path):
 		
 		seed_set = set()
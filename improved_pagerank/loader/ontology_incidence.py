@@ -0,0 +1,117 @@
+import hashlib
+import numpy as np
+import scipy.sparse as sp
+
+
+class OntologyIncidence():
+	""" Gene -> ontology annotations as one sparse gene x term incidence matrix
+	per database (GO, KEGG, Reactome, ...).
+
+	genes is the gene index table shared by the rows of every matrix, and
+	terms[db] the term index table of the columns of incidence[db], which
+	holds 1.0 where the gene is annotated with the term. gene_index and
+	term_index[db] map names back to positions.
+	"""
+
+	def __init__(self, genes, databases, terms, incidence):
+		self.genes = list(genes)
+		self.gene_index = {gene: index for index, gene in enumerate(self.genes)}
+
+		self.databases = list(databases)
+		self.terms = {db: list(terms[db]) for db in self.databases}
+		self.term_index = {db: {term: index for index, term in enumerate(self.terms[db])} for db in self.databases}
+		self.incidence = incidence
+
+		for db in self.databases:
+			assert self.incidence[db].shape == (len(self.genes), len(self.terms[db])), "incidence matrix and index tables are not aligned"
+
+
+	@classmethod
+	def from_columns(cls, columns):
+		""" Build from the gene, term and db codes of Loader.load_columns. Terms
+		keep their order of first appearance within their database, and an
+		annotation listed twice counts once.
+		"""
+		gene_codes = np.asarray(columns["gene_codes"])
+		term_codes = np.asarray(columns["term_codes"])
+		db_codes = np.asarray(columns["db_codes"])
+
+		genes = columns["gene_table"].tolist()
+		term_table = np.asarray(columns["term_table"])
+		databases = columns["db_table"].tolist()
+
+		terms = {}
+		incidence = {}
+
+		for code, db in enumerate(databases):
+			in_db = db_codes == code
+			db_terms, term_columns = np.unique(term_codes[in_db], return_inverse = True)
+
+			matrix = sp.csr_matrix((np.ones(len(term_columns)), (gene_codes[in_db], term_columns)), shape = (len(genes), len(db_terms)))
+			matrix.sum_duplicates()
+			matrix.data[:] = 1.0
+
+			terms[db] = term_table[db_terms].tolist()
+			incidence[db] = matrix
+
+		return cls(genes, databases, terms, incidence)
+
+
+	def aligned(self, nodes):
+		""" Same annotations with rows in the order of nodes (a network node
+		list). Nodes without annotations get empty rows.
+		"""
+		rows = np.fromiter((self.gene_index.get(node, -1) for node in nodes), dtype = np.int64, count = len(nodes))
+		annotated = np.flatnonzero(rows >= 0)
+
+		selection = sp.csr_matrix((np.ones(len(annotated)), (annotated, rows[annotated])), shape = (len(nodes), len(self.genes)))
+
+		return OntologyIncidence(nodes, self.databases, self.terms, {db: selection.dot(self.incidence[db]).tocsr() for db in self.databases})
+
+
+	def disease_indicators(self, disease_ontology):
+		""" db -> 0/1 vector over terms[db] marking the disease terms, for the
+		databases present in both. Disease terms no gene is annotated with
+		have no column, so |D_db| must be taken from disease_ontology itself.
+		"""
+		indicators = {}
+
+		for db, disease_terms in disease_ontology.items():
+			if db not in self.term_index:
+				continue
+
+			indicator = np.zeros(len(self.terms[db]))
+			columns = [self.term_index[db][term] for term in disease_terms if term in self.term_index[db]]
+			indicator[columns] = 1.0
+
+			indicators[db] = indicator
+
+		return indicators
+
+
+	def digest(self):
+		""" SHA-256 of the genes, terms and incidence matrices. """
+		sha256 = hashlib.sha256()
+
+		sha256.update(repr((self.genes, self.databases, self.terms)).encode())
+		for db in self.databases:
+			incidence = self.incidence[db]
+			sha256.update(np.ascontiguousarray(incidence.indptr, dtype = np.int64).tobytes())
+			sha256.update(np.ascontiguousarray(incidence.indices, dtype = np.int64).tobytes())
+
+		return sha256.hexdigest()
+
+
+	def to_map(self):
+		""" The gene -> db -> set of terms dict of Loader.load_map__gene__ontologies. """
+		map__gene__ontologies = {}
+
+		for db in self.databases:
+			coo = self.incidence[db].tocoo()
+			terms = self.terms[db]
+
+			for row, col in zip(coo.row.tolist(), coo.col.tolist()):
+				map__gene__ontologies.setdefault(self.genes[row], {}).setdefault(db, set()).add(terms[col])
+
+		# genes in their order of first appearance, as the loader inserts them
+		return {gene: map__gene__ontologies[gene] for gene in self.genes if gene in map__gene__ontologies}
@@ -111,6 +111,7 @@
 
 import networkx as nx
 from improved_pagerank.matrix_creation.matrix_aggregation import MatrixAggregation
+from improved_pagerank.matrix_creation.multi_network_aggregation_creation import MultiNetworkAggregationCreation
 
 class ConvexCombinationMatrixAggregationCreation(MatrixAggregation):
     
@@ -157,6 +158,32 @@ class ConvexCombinationMatrixAggregationCreation(MatrixAggregation):
         return aggregated_graph, V
 
 
+    def run_sparse(self, chosen_policy):
+        """ run() for SparseNetwork inputs, without intermediate graphs: beta * P
+        + (1 - beta) * C of the row-normalized networks, summed over
+        the edges of either as _aggregate_adjacency_matrix adds them. Returns
+        the aggregated SparseNetwork and its node set.
+        """
+        aggregated_operator, V = self.run_lazy(chosen_policy)
+
+        return aggregated_operator.to_network(), V
+
+
+    def run_lazy(self, chosen_policy):
+        """ run_sparse() as a ConvexCombinationOperator, which applies
+        beta * P + (1 - beta) * C on the fly from the two components instead
+        of storing their sum. The components are those of
+        MultiNetworkAggregationCreation on [PPI, co-expression].
+        """
+        if chosen_policy not in ["Intersection", "PPI_network"]:
+            print("No corrected chosen policy", chosen_policy)
+            exit(self.choose_policy_exit)
+
+        matrix_creation_step = MultiNetworkAggregationCreation([self.PPI, self.CO_expression_network], [self.beta, 1 - self.beta])
+
+        return matrix_creation_step.run_lazy("first_network" if chosen_policy == "PPI_network" else chosen_policy)
+
+
     def _aggregate_adjacency_matrix(self, PPI_network, CO_expression_network, V):
         final_graph = nx.DiGraph()
 
@@ -0,0 +1,105 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+
+
+class ConvexCombinationOperator():
+    """ The aggregated network sum_k w_k A_k kept as its row-normalized
+    components A_k (for two networks, beta * P + (1 - beta) * C), with the
+    node list of their rows and columns.
+
+    The sparse cores only need products with the transposed transition
+    matrix, which transition_operator_T() applies from the components
+    directly, so the sum is never stored and with_weights() / with_beta()
+    change the weights without a rebuild. to_network() materializes the sum.
+    """
+
+    def __init__(self, components, weights, nodes):
+        self.components = [sp.csr_matrix(component) for component in components]
+        self.weights = list(weights)
+        self.nodes = list(nodes)
+        self.node_index = {node: index for index, node in enumerate(self.nodes)}
+
+        assert len(self.components) == len(self.weights), "one weight is needed per component"
+        for component in self.components:
+            assert component.shape == (len(self.nodes), len(self.nodes)), "component matrices and node list are not aligned"
+
+        # a row of the sum totals the weights of the components with edges
+        # there; the cores normalize it to 1
+        out_weights = np.zeros(len(self.nodes))
+        for weight, component in zip(self.weights, self.components):
+            out_weights += weight * (np.diff(component.indptr) > 0)
+
+        self.row_scaling = np.zeros(len(self.nodes), dtype = self.dtype)
+        np.divide(1.0, out_weights, out = self.row_scaling, where = out_weights != 0.0)
+
+
+    def with_weights(self, weights):
+        """ Same components, other weights. """
+        return ConvexCombinationOperator(self.components, weights, self.nodes)
+
+
+    def with_beta(self, beta):
+        """ beta * P + (1 - beta) * C on the same two components. """
+        assert len(self.components) == 2, "beta only weights two components"
+        return self.with_weights([beta, 1 - beta])
+
+
+    def compact(self):
+        """ Copy with float32 components and int32 indices. """
+        components = [SparseNetwork(component, self.nodes).compact().adjacency for component in self.components]
+
+        return ConvexCombinationOperator(components, self.weights, self.nodes)
+
+
+    @property
+    def dtype(self):
+        return self.components[0].dtype
+
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+
+    def number_of_edges(self):
+        # an edge of several components is counted once
+        pattern = sum(component.astype(bool).astype(np.int8) for component in self.components)
+        return pattern.nnz
+
+
+    def transition_operator_T(self):
+        """ LinearOperator of the transposed transition matrix of the sum,
+        applied to a vector or to the columns of a block.
+        """
+        transposed = [component.T for component in self.components]
+
+        def matmat(X):
+            scaled = X * (self.row_scaling[:, None] if X.ndim == 2 else self.row_scaling)
+            return sum(weight * component_T.dot(scaled) for weight, component_T in zip(self.weights, transposed))
+
+        n = len(self.nodes)
+        return spla.LinearOperator((n, n), matvec = matmat, matmat = matmat, dtype = self.dtype)
+
+
+    def transition_diagonal(self):
+        """ Diagonal of the transition matrix (self loops), for the Jacobi
+        preconditioner of the Krylov solvers.
+        """
+        return self.row_scaling * sum(weight * component.diagonal() for weight, component in zip(self.weights, self.components))
+
+
+    def to_network(self):
+        """ The sum as a SparseNetwork, built in one pass over the entries of
+        every component; an edge of several components sums their weights.
+        """
+        entries = [component.tocoo() for component in self.components]
+
+        n = len(self.nodes)
+        aggregated = sp.csr_matrix((
+            np.concatenate([weight * entry.data for weight, entry in zip(self.weights, entries)]),
+            (np.concatenate([entry.row for entry in entries]), np.concatenate([entry.col for entry in entries]))),
+            shape = (n, n))
+
+        return SparseNetwork(aggregated, self.nodes)
@@ -0,0 +1,112 @@
+import numpy as np
+import scipy.sparse as sp
+from improved_pagerank.matrix_creation.matrix_aggregation import MatrixAggregation
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+from improved_pagerank.matrix_creation.convex_combination_operator import ConvexCombinationOperator
+
+class MultiNetworkAggregationCreation(MatrixAggregation):
+    """ Convex combination sum_k w_k A_k of any number of networks (PPI,
+    co-expression, pathway co-membership, ...), A_k the row-normalized
+    adjacency of network k on a shared gene index.
+
+    Networks are SparseNetworks or networkx graphs, weights are one per
+    network, non-negative and summing to 1. For two networks with weights
+    (beta, 1 - beta) this is ConvexCombinationMatrixAggregationCreation.
+    """
+
+    def __init__(self, networks, weights):
+        self.networks = [network if isinstance(network, SparseNetwork) else SparseNetwork.from_graph(network) for network in networks]
+        self.weights = list(weights)
+
+        assert len(self.networks) > 0 and len(self.networks) == len(self.weights), "one weight is needed per network"
+        assert min(self.weights) >= 0.0 and abs(sum(self.weights) - 1.0) < 1e-9, "network weights are not convex"
+
+        self.choose_policy_exit = 1
+
+
+    def choose_policy(self, chosen_policy = "first_network"):
+        """ Node list of the shared index: the nodes of the first network, of
+        every network or of any network, in order of first appearance.
+        """
+        if chosen_policy == "first_network":
+            return list(self.networks[0].nodes)
+        elif chosen_policy == "Intersection":
+            return [node for node in self.networks[0].nodes if all(node in network.node_index for network in self.networks[1:])]
+        elif chosen_policy == "Union":
+            return list(dict.fromkeys(node for network in self.networks for node in network.nodes))
+        else:
+            print("No corrected chosen policy", chosen_policy)
+            exit(self.choose_policy_exit)
+
+
+    def run(self, chosen_policy = "first_network"):
+        """ The aggregated SparseNetwork and its node set. """
+        aggregated_operator, V = self.run_lazy(chosen_policy)
+
+        return aggregated_operator.to_network(), V
+
+
+    def run_lazy(self, chosen_policy = "first_network"):
+        """ run() as a ConvexCombinationOperator over the normalized networks,
+        which the sparse engines apply without storing the sum.
+        """
+        components, nodes = self._sparse_components(chosen_policy)
+
+        aggregated_operator = ConvexCombinationOperator(components, self.weights, nodes)
+        V = set(aggregated_operator.nodes)
+
+        return aggregated_operator, V
+
+
+    def _sparse_components(self, chosen_policy):
+        """ The row-normalized networks, with their positive edges only, and
+        the node list they are aligned on.
+
+        Every network is aligned on the index of the policy's node list
+        through index masks and row-normalized (D^-1 A, D the diagonal of row
+        totals). Nodes without an edge in any network are dropped.
+        """
+        nodes = self.choose_policy(chosen_policy)
+        node_index = {node: index for index, node in enumerate(nodes)}
+
+        components = []
+        for network in self.networks:
+            normalized = self._normalize_matrix(self._align_network(network, node_index))
+            normalized.data[normalized.data <= 0.0] = 0.0
+            normalized.eliminate_zeros()
+            components.append(normalized)
+
+        has_edge = np.zeros(len(nodes), dtype = bool)
+        for normalized in components:
+            has_edge |= np.diff(normalized.indptr) > 0
+            has_edge[normalized.indices] = True
+        kept = np.flatnonzero(has_edge)
+
+        return [normalized[kept][:, kept] for normalized in components], [nodes[index] for index in kept]
+
+
+    def _align_network(self, network, node_index):
+        """ Adjacency of a SparseNetwork on node_index; edges with an end
+        outside of it are masked out.
+        """
+        positions = np.fromiter((node_index.get(node, -1) for node in network.nodes), dtype = np.int64, count = network.number_of_nodes())
+
+        adjacency = network.adjacency.tocoo()
+        rows = positions[adjacency.row]
+        cols = positions[adjacency.col]
+        inside = (rows >= 0) & (cols >= 0)
+
+        return sp.csr_matrix((adjacency.data[inside], (rows[inside], cols[inside])), shape = (len(node_index), len(node_index)))
+
+
+    def _normalize_matrix(self, A):
+        """ A with every row divided by its total weight; rows without weight
+        stay zero.
+        """
+        total_weights = np.repeat(np.asarray(A.sum(axis = 1)).ravel(), np.diff(A.indptr))
+
+        normalized = A.copy()
+        normalized.data = np.zeros_like(A.data)
+        np.divide(A.data, total_weights, out = normalized.data, where = total_weights != 0.0)
+
+        return normalized
@@ -0,0 +1,93 @@
+import numpy as np
+import networkx as nx
+import scipy.sparse as sp
+
+
+class SparseNetwork():
+    """ CSR adjacency with the node list giving the order of its rows and
+    columns. Weights keep the dtype of the matrix they are built from; the
+    compact() copy stores float32 weights with int32 indices, and the sparse
+    cores then iterate in float32 as well.
+    """
+
+    def __init__(self, adjacency, nodes, dtype = None):
+        self.adjacency = sp.csr_matrix(adjacency, dtype = dtype)
+        self.nodes = list(nodes)
+        self.node_index = {node: index for index, node in enumerate(self.nodes)}
+
+        assert self.adjacency.shape == (len(self.nodes), len(self.nodes)), "adjacency matrix and node list are not aligned"
+
+
+    @classmethod
+    def from_graph(cls, G, nodes = None, default_weight = 0.0, dtype = np.float64):
+        """ Build the CSR adjacency of G. When nodes is given, the matrix is
+        aligned to that order and edges leaving it are dropped.
+        """
+        if nodes is None:
+            nodes = list(G.nodes())
+
+        node_index = {node: index for index, node in enumerate(nodes)}
+
+        rows = []
+        cols = []
+        weights = []
+
+        for source, target, weight in G.edges(data = 'weight', default = default_weight):
+            if source in node_index and target in node_index:
+                rows.append(node_index[source])
+                cols.append(node_index[target])
+                weights.append(weight)
+
+        adjacency = sp.csr_matrix((np.asarray(weights, dtype = dtype), (rows, cols)), shape = (len(nodes), len(nodes)))
+
+        return cls(adjacency, nodes)
+
+
+    def compact(self):
+        """ Copy with float32 weights and int32 indices, about two thirds of
+        the float64 memory, at float32 precision.
+        """
+        adjacency = self.adjacency.astype(np.float32)
+        adjacency.indices = adjacency.indices.astype(np.int32)
+        adjacency.indptr = adjacency.indptr.astype(np.int32)
+
+        return SparseNetwork(adjacency, self.nodes)
+
+
+    @property
+    def dtype(self):
+        return self.adjacency.dtype
+
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+
+    def number_of_edges(self):
+        return self.adjacency.nnz
+
+
+    def out_weights(self):
+        return np.asarray(self.adjacency.sum(axis = 1)).ravel()
+
+
+    def transition_matrix(self):
+        """ Row-normalized adjacency. Rows without outgoing weight stay empty. """
+        out_weights = self.out_weights()
+
+        scaling = np.zeros_like(out_weights)
+        np.divide(1.0, out_weights, out = scaling, where = out_weights != 0.0)
+
+        return sp.diags(scaling.astype(self.dtype)).dot(self.adjacency).tocsr()
+
+
+    def to_graph(self):
+        G = nx.DiGraph()
+        G.add_nodes_from(self.nodes)
+
+        coo = self.adjacency.tocoo()
+        sources = [self.nodes[row] for row in coo.row.tolist()]
+        targets = [self.nodes[col] for col in coo.col.tolist()]
+        G.add_weighted_edges_from(zip(sources, targets, coo.data.tolist()))
+
+        return G
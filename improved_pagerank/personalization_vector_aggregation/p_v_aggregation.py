@@ -1,43 +1,149 @@
+import functools
+import numpy as np
+
+from improved_pagerank.personalization_vector_creation.sparse_personalization_vector import SparsePersonalizationVector
+
+
 class PersonalizationVectorAggregation():
+	""" Aggregates the component personalization vectors p_0, ..., p_K-1 into
+	one, L1-normalized over the universe:
+
+	Sum: alpha p_0 + (1 - alpha) (p_1 + ... + p_K-1)
+	Product: alpha p_0 p_1 ... p_K-1
+	WeightedGeometric: p_0^alpha (p_1 ... p_K-1)^((1 - alpha) / (K - 1))
+	Max: max(alpha p_0, (1 - alpha) p_1, ..., (1 - alpha) p_K-1)
+
+	Vectors are dicts over the universe, arrays aligned to nodes or
+	SparsePersonalizationVectors; they are stacked into a K x N array and
+	reduced in one call, or by run_sparse() over their entries only.
+	"""
 	
-	def __init__(self, personalization_vectors,universe,alpha):
+	def __init__(self, personalization_vectors,universe,alpha, nodes = None):
 
 		self.alpha = alpha
 		self.universe = universe
 		self.map__index__p_vs = {i:p_v for i,p_v in enumerate(personalization_vectors)}
+
+		# index of the arrays (the graph's node list); the universe by default
+		self.nodes = list(nodes) if nodes is not None else list(universe)
+		self.choose_policy_exit = 1
 		
 
 	def run(self,chosen_policy = "Sum"):
-		
-		aggregated_personalization_vector = {}
-	
-		for node in self.universe:
-			aggregated_personalization_vector[node] = 0.0
+		""" The aggregated vector as a dict over nodes (the universe by default). """
+		personalization_vector = self.run_array(chosen_policy = chosen_policy)
+
+		return dict(zip(self.nodes, personalization_vector.tolist()))
+
+
+	def run_array(self, chosen_policy = "Sum"):
+		""" The aggregated vector as an array aligned to nodes; nodes outside of
+		the universe get 0.
+		"""
+		node_index = {node: index for index, node in enumerate(self.nodes)}
+		universe_positions = np.asarray([node_index[node] for node in self.universe], dtype = np.int64)
+
+		aggregated_personalization_vector = self.__aggregate__(self.stack(), chosen_policy)
+
+		personalization_vector = np.zeros(len(self.nodes))
+		personalization_vector[universe_positions] = aggregated_personalization_vector[universe_positions]
+
+		# summed in the order of the universe, as sum() over a dict
+		l_1 = sum(personalization_vector[universe_positions].tolist())
+
+		return personalization_vector / l_1
+
+
+	def run_sparse(self, chosen_policy = "Sum"):
+		""" run_array() for SparsePersonalizationVectors, as one: only the
+		union (Sum, Max) or the intersection (Product, WeightedGeometric) of
+		their entries is aggregated, never an N-long vector. The vectors hold
+		universe entries only, as the creation stages emit them.
+		"""
+		personalization_vectors = list(self.map__index__p_vs.values())
+
+		for p_v in personalization_vectors:
+			assert isinstance(p_v, SparsePersonalizationVector) and p_v.size == len(self.nodes), "personalization vector is not a sparse vector aligned with nodes"
+
+		if chosen_policy in ["Sum", "Max"]:
+			support = functools.reduce(np.union1d, [p_v.indices for p_v in personalization_vectors])
+		elif chosen_policy in ["Product", "WeightedGeometric"]:
+			# entries where a vector of positive weight is 0 stay 0
+			weights = self.__weights__(len(personalization_vectors), chosen_policy)
+			support = functools.reduce(np.intersect1d, [p_v.indices for weight, p_v in zip(weights, personalization_vectors) if weight > 0.0])
+		else:
+			print("No corrected chosen policy", chosen_policy)
+			exit(self.choose_policy_exit)
+
+		stacked_personalization_vectors = np.zeros((len(personalization_vectors), len(support)))
+		for i, p_v in enumerate(personalization_vectors):
+			positions = np.minimum(np.searchsorted(support, p_v.indices), max(len(support) - 1, 0))
+			inside = support[positions] == p_v.indices if len(support) > 0 else np.zeros(p_v.nnz, dtype = bool)
+			stacked_personalization_vectors[i, positions[inside]] = p_v.values[inside]
+
+		aggregated_personalization_vector = self.__aggregate__(stacked_personalization_vectors, chosen_policy)
+
+		l_1 = sum(aggregated_personalization_vector.tolist())
+		non_zero = np.flatnonzero(aggregated_personalization_vector)
+
+		return SparsePersonalizationVector(support[non_zero], aggregated_personalization_vector[non_zero] / l_1, len(self.nodes))
 
-			for i, p_v in self.map__index__p_vs.items():
 
-				if i == 0:
-					aggregated_personalization_vector[node] += (self.alpha)*p_v[node]
+	def __weights__(self, number_of_vectors, chosen_policy):
+		""" Weight of each vector: alpha for p_0 and 1 - alpha for the others,
+		shared among them for WeightedGeometric.
+		"""
+		weights = np.asarray([self.alpha] + [1 - self.alpha] * (number_of_vectors - 1))
 
-				else:
-					if chosen_policy == "Sum":
-						aggregated_personalization_vector[node] += (1 - self.alpha)*p_v[node]
-					
-					elif chosen_policy == "Product":
-						aggregated_personalization_vector[node] *= p_v[node]
+		if chosen_policy == "WeightedGeometric":
+			if number_of_vectors > 1:
+				weights[1:] = (1 - self.alpha) / (number_of_vectors - 1)
+			else:
+				weights[0] = 1.0
 
-		l_1 = sum(aggregated_personalization_vector.values())
+		return weights
 
-		personalization_vectors = {k: v/l_1 for k,v in aggregated_personalization_vector.items()}
 
-		return personalization_vectors
+	def __aggregate__(self, stacked_personalization_vectors, chosen_policy):
+		""" The policy's reduction of the rows of a K x M array. """
+		weights = self.__weights__(len(stacked_personalization_vectors), chosen_policy)
 
+		if chosen_policy == "Sum":
+			# one vector at a time, in the order the dict loop adds them
+			aggregated_personalization_vector = weights[0] * stacked_personalization_vectors[0]
+			for weight, p_v in zip(weights[1:], stacked_personalization_vectors[1:]):
+				aggregated_personalization_vector = aggregated_personalization_vector + weight * p_v
 
+		elif chosen_policy == "Product":
+			aggregated_personalization_vector = weights[0] * stacked_personalization_vectors[0]
+			for p_v in stacked_personalization_vectors[1:]:
+				aggregated_personalization_vector = aggregated_personalization_vector * p_v
 
+		elif chosen_policy == "WeightedGeometric":
+			aggregated_personalization_vector = np.prod(stacked_personalization_vectors ** weights[:, None], axis = 0)
 
+		elif chosen_policy == "Max":
+			aggregated_personalization_vector = np.max(weights[:, None] * stacked_personalization_vectors, axis = 0)
 
+		else:
+			print("No corrected chosen policy", chosen_policy)
+			exit(self.choose_policy_exit)
 
+		return aggregated_personalization_vector
 
 
+	def stack(self):
+		""" K x N array of the personalization vectors, aligned to nodes. """
+		stacked_personalization_vectors = np.zeros((len(self.map__index__p_vs), len(self.nodes)))
 
+		for i, p_v in self.map__index__p_vs.items():
+			if isinstance(p_v, SparsePersonalizationVector):
+				assert p_v.size == len(self.nodes), "personalization vector is not aligned with nodes"
+				stacked_personalization_vectors[i] = p_v.to_array()
+			elif isinstance(p_v, dict):
+				stacked_personalization_vectors[i] = np.fromiter((p_v.get(node, 0.0) for node in self.nodes), dtype = np.float64, count = len(self.nodes))
+			else:
+				assert np.shape(p_v) == (len(self.nodes),), "personalization vector is not aligned with nodes"
+				stacked_personalization_vectors[i] = p_v
 
+		return stacked_personalization_vectors
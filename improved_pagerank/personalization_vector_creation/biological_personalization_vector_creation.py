@@ -1,7 +1,17 @@
+import numpy as np
+
 from improved_pagerank.personalization_vector_creation.pv_creation import PersonalizationVectorCreation
+from improved_pagerank.loader.ontology_incidence import OntologyIncidence
+from improved_pagerank.personalization_vector_creation.sparse_personalization_vector import SparsePersonalizationVector
 
 
 class BiologicalPersonalizationVectorCreation(PersonalizationVectorCreation):
+	""" Relevance of a gene: sum over the databases of the fraction of the
+	disease terms it is annotated with; seeds get the number of databases.
+	L1-normalized over the universe. map__gene_name__ontologies is the
+	gene -> db -> terms dict, walked gene by gene, or an OntologyIncidence,
+	for which the relevance of every gene comes from sparse mat-vecs.
+	"""
 	
 	def __init__(self, source, universe, disease_ontology = None, map__gene_name__ontologies = None, universe_ontologies = None):
 		
@@ -16,9 +26,64 @@ class BiologicalPersonalizationVectorCreation(PersonalizationVectorCreation):
 
 	
 	def run(self, ):
+		if isinstance(self.map__gene_name__ontologies, OntologyIncidence):
+			nodes = list(self.universe)
+			vector = self.run_vector(nodes)
+
+			return dict(zip(nodes, vector.tolist()))
+
 		return self._set_up_biological_personalization_vector()
 
 
+	def run_sparse(self, nodes, node_index = None):
+		""" The vector as a SparsePersonalizationVector over nodes: the seeds
+		and the genes sharing a disease term.
+		"""
+		if isinstance(self.map__gene_name__ontologies, OntologyIncidence):
+			return SparsePersonalizationVector.from_array(self.run_vector(nodes))
+
+		if node_index == None:
+			node_index = {node: index for index, node in enumerate(nodes)}
+
+		return SparsePersonalizationVector.from_dict(self._set_up_biological_personalization_vector(), node_index)
+
+
+	def run_vector(self, nodes, discriminant = True):
+		""" The personalization vector as a NumPy array aligned to nodes (the
+		graph index), from an OntologyIncidence: sum_db X_db . d_db / |D_db|
+		with X_db the gene x term incidence and d_db the disease indicator.
+		Nodes outside of the universe get 0. Equal to the dict of run().
+		"""
+		assert isinstance(self.map__gene_name__ontologies, OntologyIncidence) and self.disease_ontology != None, "Not enough input parameters for biological teleporting probability"
+
+		assert len(self.selected_seed_set) != 0, "No source gene in PPI network"
+
+		node_index = {node: index for index, node in enumerate(nodes)}
+		universe_positions = np.asarray([node_index[node] for node in self.universe], dtype = np.int64)
+
+		incidence = self.map__gene_name__ontologies.aligned(nodes)
+		disease_indicators = incidence.disease_indicators(self.disease_ontology)
+
+		# shared disease terms are counted first and divided after, as the
+		# dict loop does, so the vector is exact
+		relevance = np.zeros(len(nodes))
+		for db, disease_terms in self.disease_ontology.items():
+			if db in disease_indicators and len(disease_terms) > 0:
+				relevance += incidence.incidence[db].dot(disease_indicators[db]) / len(disease_terms)
+
+		if discriminant:
+			relevance[[node_index[node] for node in self.selected_seed_set]] = len(self.disease_ontology)
+
+		personalization_vector = np.zeros(len(nodes))
+		personalization_vector[universe_positions] = relevance[universe_positions]
+
+		# summed in the order of the universe, as sum() over the dict
+		l_1_norm = sum(personalization_vector[universe_positions].tolist())
+		assert l_1_norm > 0.0, "personalization vector is the null vector"
+
+		return personalization_vector / l_1_norm
+
+
 	def _set_up_biological_personalization_vector(self,discriminant = True):
 		
 		assert self.map__gene_name__ontologies != None and self.disease_ontology != None, "Not enough input parameters for biological teleporting probability"
@@ -1,4 +1,5 @@
 from improved_pagerank.personalization_vector_creation.pv_creation import PersonalizationVectorCreation
+from improved_pagerank.personalization_vector_creation.sparse_personalization_vector import SparsePersonalizationVector
 
 class DefaultPersonalizationVectorCreation(PersonalizationVectorCreation):
 
@@ -14,6 +15,21 @@ class DefaultPersonalizationVectorCreation(PersonalizationVectorCreation):
 		return self._set_up_default_personalization_vactor()
 
 	
+	def run_sparse(self, nodes, node_index = None):
+		""" The vector as a SparsePersonalizationVector over nodes: one entry
+		per seed.
+		"""
+		size = len(self.selected_seed_set)
+		assert size != 0, ",".join(list(self.source_not_in_G)) + " are not in G"
+
+		if node_index == None:
+			node_index = {node: index for index, node in enumerate(nodes)}
+
+		indices = [node_index[node] for node in self.selected_seed_set]
+
+		return SparsePersonalizationVector(indices, [1.0/size] * len(indices), len(nodes))
+
+	
 	def _set_up_default_personalization_vactor(self,):
 		
 		personalization_vector = {}
@@ -0,0 +1,166 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+from collections import OrderedDict
+
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+from improved_pagerank.loader.ontology_incidence import OntologyIncidence
+from improved_pagerank.personalization_vector_creation.sparse_personalization_vector import SparsePersonalizationVector
+
+
+class PersonalizationVectorCache():
+	""" Component personalization vectors, keyed by content hashes of the
+	inputs they depend on:
+
+	default: seed set and universe
+	biological: seed set, universe, disease ontology and gene -> ontologies map
+	topological: seed set, universe, structure of G and secondary seed set
+
+	Entries are kept in memory, least recently used evicted beyond
+	max_entries, and with cache_dir also as .npz files there, least recently
+	used removed once they total more than max_disk_bytes. Vectors are dicts
+	or SparsePersonalizationVectors, whose key includes the node order.
+	"""
+
+	def __init__(self, max_entries = 64, cache_dir = None, max_disk_bytes = 1 << 30):
+		self.max_entries = max_entries
+		self.cache_dir = cache_dir
+		self.max_disk_bytes = max_disk_bytes
+
+		self.entries = OrderedDict()
+
+
+	@staticmethod
+	def digest(*parts):
+		""" SHA-256 of strings and arrays. """
+		sha256 = hashlib.sha256()
+
+		for part in parts:
+			if isinstance(part, np.ndarray):
+				sha256.update(np.ascontiguousarray(part, dtype = np.int64).tobytes())
+			else:
+				sha256.update(repr(part).encode())
+			sha256.update(b"|")
+
+		return sha256.hexdigest()
+
+
+	def input_digests(self, V, G = None, secondary_seed_set = None, disease_ontology = None, map__gene__ontologies = None, nodes = None):
+		""" Digests of the inputs shared by every seed set. The topological
+		vector only reads the edges of G, so its weights are left out. nodes
+		is the index of sparse vectors.
+		"""
+		digests = {"universe": self.digest(sorted(V))}
+
+		if nodes != None:
+			digests["nodes"] = self.digest(list(nodes))
+
+		if G != None:
+			network = G if isinstance(G, SparseNetwork) else SparseNetwork.from_graph(G)
+			digests["network"] = self.digest(network.nodes, network.adjacency.indptr, network.adjacency.indices)
+
+		if secondary_seed_set != None:
+			digests["secondary_seed_set"] = self.digest(sorted(secondary_seed_set.items()))
+
+		if disease_ontology != None:
+			digests["disease_ontology"] = self.digest(sorted((db, sorted(terms)) for db, terms in disease_ontology.items()))
+
+		if isinstance(map__gene__ontologies, OntologyIncidence):
+			digests["map__gene__ontologies"] = map__gene__ontologies.digest()
+		elif map__gene__ontologies != None:
+			digests["map__gene__ontologies"] = self.digest(sorted((gene, sorted((db, sorted(terms)) for db, terms in ontologies.items()))
+				for gene, ontologies in map__gene__ontologies.items()))
+
+		return digests
+
+
+	def key(self, policy, seed_set, input_digests):
+		""" Key of the policy's vector for a seed set. """
+		inputs = {
+			"default": ["universe"],
+			"biological": ["universe", "disease_ontology", "map__gene__ontologies"],
+			"topological": ["universe", "network", "secondary_seed_set"]}[policy]
+
+		return self.digest(policy, sorted(seed_set), [input_digests.get(name) for name in inputs + ["nodes"]])
+
+
+	def get(self, key):
+		""" The cached vector, or None. """
+		if key in self.entries:
+			self.entries.move_to_end(key)
+			return self.entries[key]
+
+		if self.cache_dir == None:
+			return None
+
+		file_path = os.path.join(self.cache_dir, key + ".npz")
+		if not os.path.exists(file_path):
+			return None
+
+		with np.load(file_path, allow_pickle = False) as arrays:
+			if "indices" in arrays:
+				personalization_vector = SparsePersonalizationVector(arrays["indices"], arrays["values"], int(arrays["size"]))
+			else:
+				personalization_vector = dict(zip(arrays["nodes"].tolist(), arrays["values"].tolist()))
+
+		# marks the file as recently used
+		os.utime(file_path)
+		self.__remember__(key, personalization_vector)
+
+		return personalization_vector
+
+
+	def put(self, key, personalization_vector):
+		self.__remember__(key, personalization_vector)
+
+		if self.cache_dir == None:
+			return
+
+		# written next to the entry and renamed, so readers never see half of it
+		os.makedirs(self.cache_dir, exist_ok = True)
+		file_descriptor, temporary_path = tempfile.mkstemp(dir = self.cache_dir, prefix = key + ".", suffix = ".tmp")
+
+		with os.fdopen(file_descriptor, 'wb') as fp:
+			if isinstance(personalization_vector, SparsePersonalizationVector):
+				np.savez(fp,
+					indices = personalization_vector.indices,
+					values = personalization_vector.values,
+					size = np.asarray(personalization_vector.size))
+			else:
+				np.savez(fp,
+					nodes = np.asarray(list(personalization_vector.keys()), dtype = str),
+					values = np.asarray(list(personalization_vector.values()), dtype = np.float64))
+
+		os.replace(temporary_path, os.path.join(self.cache_dir, key + ".npz"))
+		self.__evict_files__()
+
+
+	def __remember__(self, key, personalization_vector):
+		self.entries[key] = personalization_vector
+		self.entries.move_to_end(key)
+
+		while len(self.entries) > self.max_entries:
+			self.entries.popitem(last = False)
+
+
+	def __evict_files__(self):
+		""" Remove the least recently used files until they fit max_disk_bytes. """
+		files = []
+		for name in os.listdir(self.cache_dir):
+			if name.endswith(".npz"):
+				stat = os.stat(os.path.join(self.cache_dir, name))
+				files.append((stat.st_mtime_ns, stat.st_size, name))
+
+		total_size = sum(size for _, size, _ in files)
+
+		for _, size, name in sorted(files):
+			if total_size <= self.max_disk_bytes:
+				break
+
+			try:
+				os.remove(os.path.join(self.cache_dir, name))
+			except OSError:
+				# removed by another process meanwhile
+				pass
+			total_size -= size
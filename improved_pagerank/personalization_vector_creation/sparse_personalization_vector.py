@@ -0,0 +1,58 @@
+import numpy as np
+
+
+class SparsePersonalizationVector():
+	""" Personalization vector over a node index of the given size, stored as
+	the positions and values of its non-zero entries, sorted by position.
+	Seed-only vectors hold a few hundred entries instead of one per gene.
+	"""
+
+	def __init__(self, indices, values, size):
+		indices = np.asarray(indices, dtype = np.int64)
+		values = np.asarray(values, dtype = np.float64)
+
+		assert indices.shape == values.shape, "indices and values are not aligned"
+
+		order = np.argsort(indices, kind = "stable")
+		self.indices = indices[order]
+		self.values = values[order]
+		self.size = size
+
+
+	@classmethod
+	def from_array(cls, personalization_vector):
+		""" The non-zero entries of a vector aligned to the node index. """
+		indices = np.flatnonzero(personalization_vector)
+
+		return cls(indices, np.asarray(personalization_vector)[indices], len(personalization_vector))
+
+
+	@classmethod
+	def from_dict(cls, personalization_vector, node_index):
+		""" The non-zero entries of a node -> score dict; nodes outside of
+		node_index are dropped.
+		"""
+		entries = [(node_index[node], score) for node, score in personalization_vector.items() if score != 0.0 and node in node_index]
+
+		if len(entries) == 0:
+			return cls([], [], len(node_index))
+
+		indices, values = zip(*entries)
+		return cls(indices, values, len(node_index))
+
+
+	@property
+	def nnz(self):
+		return len(self.indices)
+
+
+	def to_array(self, dtype = np.float64):
+		personalization_vector = np.zeros(self.size, dtype = dtype)
+		personalization_vector[self.indices] = self.values
+
+		return personalization_vector
+
+
+	def to_dict(self, nodes):
+		""" node -> score of the non-zero entries. """
+		return {nodes[index]: value for index, value in zip(self.indices.tolist(), self.values.tolist())}
@@ -1,7 +1,18 @@
+import numpy as np
+import scipy.sparse as sp
+
 from improved_pagerank.personalization_vector_creation.pv_creation import PersonalizationVectorCreation
+from improved_pagerank.matrix_creation.sparse_network import SparseNetwork
+from improved_pagerank.personalization_vector_creation.sparse_personalization_vector import SparsePersonalizationVector
 
 
 class TopologicalPersonalizationVectorCreation(PersonalizationVectorCreation):
+	""" Score of a secondary seed: fraction of seeds among its neighbors plus
+	fraction of seeds among the nodes at distance 2, L1-normalized over the
+	universe. G is a networkx graph, walked node by node, or a SparseNetwork,
+	for which every score comes from sparse products at once.
+	"""
+
 	def __init__(self, source, universe, G, secondary_seed_set):
 		
 		self.universe = universe
@@ -16,6 +27,23 @@ class TopologicalPersonalizationVectorCreation(PersonalizationVectorCreation):
 		return self._set_up_topological_personalization_vector()
 
 
+	def run_sparse(self, nodes, node_index = None):
+		""" The vector as a SparsePersonalizationVector over nodes, with the
+		secondary seeds of non-zero score only. G must be a SparseNetwork.
+		"""
+		assert type(self.secondary_seed_set) == dict, "Secondary seed set is not a dictionaty with Key (string) and value (float)" 
+		assert isinstance(self.G, SparseNetwork), "the sparse topological personalization vector needs G as a SparseNetwork"
+
+		if node_index == None:
+			node_index = {node: index for index, node in enumerate(nodes)}
+
+		# in the order of the universe, so the norm is the dict's
+		scores = self._compute_topological_probabilities()
+		l_1_personalization_vector = sum(scores.values())
+
+		return SparsePersonalizationVector.from_dict({node: score/l_1_personalization_vector for node, score in scores.items()}, node_index)
+
+
 	def _get_radius_2_neighbors(self,node):
 		
 		neighbors = set(self.G[node])
@@ -46,6 +74,52 @@ class TopologicalPersonalizationVectorCreation(PersonalizationVectorCreation):
 		return proportion_of_disease_neighbors_radius_1 + proportion_of_disease_neighbors_radius_2
 
 
+	def _compute_topological_probabilities(self):
+		""" _compute_topological_node_probability of every secondary seed in
+		the universe, from the CSR structure A of G and the seed indicator s:
+		the radius 1 counts are the rows of A and A.s, and the radius 2 set
+		is the pattern of A^2 on those rows, without the radius 1 set.
+		"""
+		nodes = self.G.nodes
+		rows = np.asarray([self.G.node_index[node] for node in self.universe if node in self.secondary_seed_set], dtype = np.int64)
+
+		A = self.G.adjacency.copy()
+		A.sum_duplicates()
+		A.data = np.ones(len(A.data), dtype = np.int64)
+
+		s = np.zeros(len(nodes), dtype = np.int64)
+		s[[self.G.node_index[node] for node in self.selected_seed_set]] = 1
+
+		A_rows = A[rows]
+		degrees = np.diff(A_rows.indptr)
+		seeds_radius_1 = A_rows.dot(s)
+
+		radius_2 = A_rows.dot(A)
+		radius_2.data[:] = 1
+		radius_2 = radius_2 - radius_2.multiply(A_rows)
+
+		# set.difference(node) also drops the one-character names that are
+		# characters of node
+		single_characters = [index for index, name in enumerate(nodes) if isinstance(name, str) and len(name) == 1]
+		if len(single_characters) > 0:
+			dropped = [(row, index) for row, node in enumerate(rows) for index in single_characters if nodes[index] in nodes[node]]
+			if len(dropped) > 0:
+				dropped_rows, dropped_cols = zip(*dropped)
+				radius_2 = radius_2 - radius_2.multiply(sp.csr_matrix((np.ones(len(dropped), dtype = np.int64), (dropped_rows, dropped_cols)), shape = radius_2.shape))
+
+		radius_2 = sp.csr_matrix(radius_2)
+		radius_2.eliminate_zeros()
+		radius_2_sizes = np.diff(radius_2.indptr)
+		seeds_radius_2 = radius_2.dot(s)
+
+		if (degrees == 0).any() or (radius_2_sizes == 0).any():
+			raise ZeroDivisionError("secondary seed without neighbors at radius 1 or 2")
+
+		scores = seeds_radius_1 / degrees + seeds_radius_2 / radius_2_sizes
+
+		return dict(zip([nodes[node] for node in rows], scores.tolist()))
+
+
 	def _set_up_topological_personalization_vector(self,):
 		
 		assert type(self.secondary_seed_set) == dict, "Secondary seed set is not a dictionaty with Key (string) and value (float)" 
@@ -53,16 +127,23 @@ class TopologicalPersonalizationVectorCreation(PersonalizationVectorCreation):
 
 		personalization_vector = {}
 
-		for node in self.universe:
-			
-			if node in self.secondary_seed_set:
+		if isinstance(self.G, SparseNetwork):
+			scores = self._compute_topological_probabilities()
+
+			for node in self.universe:
+				personalization_vector[node] = scores.get(node, 0.0)
+
+		else:
+			for node in self.universe:
+				
+				if node in self.secondary_seed_set:
 
-				phi = self.secondary_seed_set[node]
-				score = self._compute_topological_node_probability(node, phi)
-				personalization_vector[node] = score
+					phi = self.secondary_seed_set[node]
+					score = self._compute_topological_node_probability(node, phi)
+					personalization_vector[node] = score
 
-			else:
-				personalization_vector[node] = 0.0
+				else:
+					personalization_vector[node] = 0.0
 
 		l_1_personalization_vector = sum(personalization_vector.values())
 